@@ -20,7 +20,9 @@ from reportlab.lib import colors
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 
-from etl.db import get_connection
+from etl.db import connection
+from etl.storage import read_dataset
+from ml.meal_optimizer import PriceIndex, SuggestionIndex
 
 # PAGE CONFIG
 st.set_page_config(
@@ -29,12 +31,20 @@ st.set_page_config(
 )
 
 # LOAD DATA
-prices_df = pd.read_csv("data/processed/predicted_prices.csv")
+prices_df = read_dataset("predicted_prices", columns=["item_name", "predicted_price", "category", "specification"])
 prices_df["category"] = prices_df["category"].fillna("Others")
-prices_df["specification"] = prices_df["specification"].fillna("")
+PRICES = PriceIndex(prices_df)
 
-with open("data/processed/nochebuena_full_menu.json") as f:
-    MENU_JSON = json.load(f)["full_menu"]
+MENU_FILE = Path("data/processed/nochebuena_full_menu.json")
+
+@st.cache_resource
+def load_menu(mtime):
+    """Menu and its suggestion index, rebuilt only when the menu file changes"""
+    with open(MENU_FILE) as f:
+        menu = json.load(f)["full_menu"]
+    return menu, SuggestionIndex(menu, key=str.lower)
+
+MENU_JSON, MENU_INDEX = load_menu(MENU_FILE.stat().st_mtime)
 
 # SESSION STATE
 st.session_state.setdefault("cart", [])
@@ -49,32 +59,25 @@ PROTEINS = [
 ]
 
 # HELPERS
-def normalize(x):
-    return x.lower()
-
 def is_protein(x):
     return any(p in x.lower() for p in PROTEINS)
 
 def get_price(item):
-    row = prices_df[prices_df["item_name"] == item]
-    return float(row["predicted_price"].iloc[0]) if not row.empty else 0.0
+    return PRICES.price(item, 0.0)
 
 # MEAL OPTIMIZER
 def suggest_meals(cart, min_match=2):
-    available = {normalize(c["item"]) for c in cart}
-    proteins = {normalize(c["item"]) for c in cart if is_protein(c["item"])}
-
-    rows = []
-    for dish in MENU_JSON:
-        ing = {normalize(i) for i in dish["ingredients"]}
-        matched = ing & available
-        if len(matched) < min_match:
-            continue
+    items = [c["item"] for c in cart]
+    proteins = [i for i in items if is_protein(i)]
 
-        missing = ing - available
-        protein_hit = bool(ing & proteins)
-        score = len(matched) * 2 + (3 if protein_hit else 0) - len(missing)
+    def score(ids, matched, missing):
+        protein_hit = MENU_INDEX.counts(proteins)[ids] > 0
+        return matched * 2 + protein_hit * 3 - missing
 
+    rows = []
+    for idx, missing in MENU_INDEX.top(items, k=10, min_match=min_match, score=score):
+        dish = MENU_JSON[idx]
+        missing = MENU_INDEX.names(missing)
         rows.append({
             "Dish": dish["dish"],
             "Course": dish["category"],
@@ -82,26 +85,21 @@ def suggest_meals(cart, min_match=2):
             "Missing": ", ".join(missing) if missing else "None",
             "Serving": dish.get("serving_size", 1),
             "Price": round(sum(get_price(i) for i in dish["ingredients"]), 2),
-            "_missing_raw": list(missing),
-            "_score": score
+            "_missing_raw": missing,
         })
-
-    df = pd.DataFrame(rows)
-    if not df.empty:
-        df = df.sort_values("_score", ascending=False).head(10)
-    return df
+    return pd.DataFrame(rows)
 
 def add_missing_items(missing_list):
     for m in missing_list:
-        for _, row in prices_df.iterrows():
-            if normalize(row["item_name"]) == m:
-                st.session_state.cart.append({
-                    "id": str(uuid.uuid4()),
-                    "item": row["item_name"],
-                    "spec": row["specification"],
-                    "price": row["predicted_price"]
-                })
-                break
+        item = PRICES.find(m)
+        if item is not None:
+            row = PRICES.get(item)
+            st.session_state.cart.append({
+                "id": str(uuid.uuid4()),
+                "item": item,
+                "spec": row["specification"],
+                "price": row["predicted_price"]
+            })
 
 # PDF GENERATION
 def generate_pdf(cart):
@@ -207,7 +205,7 @@ with left:
     else:
         item = st.selectbox("Available items", options)
         if st.button("Add to cart"):
-            row = prices_df[prices_df["item_name"] == item].iloc[0]
+            row = PRICES.get(item)
             st.session_state.cart.append({
                 "id": str(uuid.uuid4()),
                 "item": item,
@@ -317,24 +315,31 @@ st.caption(
 )
 
 if st.session_state.cart:
-    conn = get_connection()
+    # Weekly min/avg/max kept by etl/load_db.py; one query for the whole cart
     query = """
-        SELECT d.date, f.price
-        FROM fact_prices f
-        JOIN dim_item i ON f.item_id = i.item_id
-        JOIN dim_date d ON f.date_id = d.date_id
-        WHERE i.item_name = %s
-        ORDER BY d.date
+        SELECT i.item_name, w.week_start AS date, w.min_price, w.avg_price, w.max_price
+        FROM item_weekly_prices w
+        JOIN dim_item i ON w.item_id = i.item_id
+        WHERE i.item_name = ANY(%s)
+        ORDER BY i.item_name, w.week_start
     """
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(query, ([c["item"] for c in st.session_state.cart],))
+        trends = pd.DataFrame(cur.fetchall(), columns=[d[0] for d in cur.description])
+    trends["date"] = pd.to_datetime(trends["date"])
+    for col in ["min_price", "avg_price", "max_price"]:
+        trends[col] = trends[col].astype(float)
+    trends_by_item = dict(tuple(trends.groupby("item_name")))
+
     cols = st.columns(2)
     for i, c in enumerate(st.session_state.cart):
-        df = pd.read_sql(query, conn, params=(c["item"],))
-        if df.empty:
+        df = trends_by_item.get(c["item"])
+        if df is None:
             continue
         with cols[i % 2]:
-            df["date"] = pd.to_datetime(df["date"])
             fig, ax = plt.subplots(figsize=(6, 3.5))
-            ax.plot(df["date"], df["price"], marker="o", linewidth=2)
+            ax.plot(df["date"], df["avg_price"], marker="o", linewidth=2)
+            ax.fill_between(df["date"], df["min_price"], df["max_price"], alpha=0.2)
             ax.set_title(c["item"])
             ax.set_ylabel("Price (₱)")
             ax.xaxis.set_major_formatter(mdates.DateFormatter("%b %d"))
@@ -342,4 +347,3 @@ if st.session_state.cart:
             ax.grid(True, alpha=0.3)
             plt.xticks(rotation=30)
             st.pyplot(fig)
-    conn.close()
@@ -1,28 +1,36 @@
+import argparse
+import hashlib
+import io
+import json
+import resource
+import sys
+import tempfile
+from functools import lru_cache
 from pathlib import Path
+import numpy as np
 import pandas as pd
-import re
-import unicodedata
+
+# Add project root to sys.path so 'etl' can be imported
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT_DIR))
+
+from etl.ocr_index import OcrIndex, ResolutionCache, MIN_CONFIDENCE
+from etl.external_sort import external_merge
+from etl.cleaning_metrics import CleaningMetrics
+from etl.dates import DateResolver, DEFAULT_YEAR
+from etl.price_anomaly import PriceDetector
+from etl import storage
 
 # Paths
 INPUT_FILE = Path("data/processed/extracted_prices.csv")
 OUTPUT_FILE = Path("data/processed/cleaned_prices.csv")
 LOG_FILE = Path("data/processed/cleaning_log.csv")
+RULES_FILE = Path("data/processed/cleaning_rules.csv")
+WATERMARK_FILE = Path("data/processed/clean_watermark.json")
+VOCABULARY_FILE = Path(__file__).resolve().parent / "ocr_vocabulary.json"
 
-# Loads
-df = pd.read_csv(INPUT_FILE)
-df.columns = [c.strip().lower() for c in df.columns]
-
-log = []
-
-# Date
-def parse_date(day):
-    try:
-        return pd.to_datetime(f"{day} 2025", format="%B %d %Y")
-    except:
-        return pd.NaT
-
-df["date"] = df["day"].apply(parse_date)
-df.drop(columns=["day"], inplace=True)
+OUTPUT_COLUMNS = ["date", "category", "item_name", "specification", "price"]
+SORT_COLUMNS = ["date", "category", "item_name", "price"]
 
 # OCR Dictionaries
 ITEM_MAP = {
@@ -60,98 +68,373 @@ SPEC_MAP = {
     "1-19% bran streak": "1-19 bran streak"
 }
 
-# Clean Functions
-def normalize_text(text):
+ITEM_CHARS = r"A-Za-z0-9(),/\- "
+SPEC_CHARS = r"A-Za-z0-9(),/\-–%. "
+GINGER_SPEC = "Fairly well-matured, medium (150–300 g)"
+
+# Column helpers
+def distinct(series):
+    """
+    Split a column into (codes, uniques) so each distinct raw value
+    is cleaned once; results are broadcast back with values[codes]
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    return codes, pd.Series(uniques, dtype=object)
+
+def normalize_text(values):
     """Normalize unicode, remove all surrounding quotes, collapse whitespace"""
-    if pd.isna(text):
-        return ""
-    text = str(text).strip()
+    text = values.where(values.notna(), "").astype(str).str.strip()
     # Remove surrounding quotes
-    text = re.sub(r"^[\"']+|[\"']+$", "", text)
+    text = text.str.replace(r"^[\"']+|[\"']+$", "", regex=True)
     # Normalize unicode
-    text = unicodedata.normalize("NFKD", text)
+    text = text.str.normalize("NFKD")
     # Collapse whitespace
-    text = re.sub(r"\s+", " ", text)
-    return text
-
-def clean_item(name):
-    original = normalize_text(name)
-    if original in ITEM_MAP:
-        cleaned = ITEM_MAP[original]
-        log.append(("item_name", original, cleaned))
-        return cleaned
-    # Light cleanup
-    cleaned = re.sub(r"[^A-Za-z0-9(),/\- ]+", "", original)
-    cleaned = re.sub(r"\s+", " ", cleaned).strip()
-    if cleaned != original:
-        log.append(("item_name", original, cleaned))
-    return cleaned
-
-def clean_spec(spec, item_name):
-    original = normalize_text(spec)
+    return text.str.replace(r"\s+", " ", regex=True)
+
+def light_cleanup(text, allowed):
+    cleaned = text.str.replace(f"[^{allowed}]+", "", regex=True)
+    return cleaned.str.replace(r"\s+", " ", regex=True).str.strip()
+
+def build_index(mapping, vocabulary=()):
+    """
+    Index the OCR dictionary with keys normalized like the input columns,
+    plus the vocabulary's canonical names, each resolving to itself
+    """
+    keys = normalize_text(pd.Series(list(mapping), dtype=object))
+    forms = dict(zip(keys, mapping.values()))
+    for name in vocabulary:
+        forms.setdefault(name, name)
+    return OcrIndex(forms)
+
+def fuzzy_map(original, suspect, name, index):
+    """
+    Resolve suspect strings to the nearest known OCR form.
+    Returns canonical names (NaN where no confident match) and confidences.
+    """
+    mapped = pd.Series(np.nan, index=original.index, dtype=object)
+    confidence = pd.Series(0.0, index=original.index)
+    for i in original.index[suspect]:
+        canonical, score = CACHE.resolve(name, index, original[i])
+        confidence[i] = score
+        if canonical is not None and score >= MIN_CONFIDENCE:
+            mapped[i] = canonical
+    return mapped, confidence
+
+# Fuzzy OCR correction, built on first use and kept for the process.
+# The vocabulary is a reviewed, versioned list of canonical names, so
+# cleaning never depends on what an earlier run happened to output.
+@lru_cache(maxsize=None)
+def ocr_index(column):
+    vocabulary = json.loads(VOCABULARY_FILE.read_text(encoding="utf-8"))
+    return build_index(ITEM_MAP if column == "item_name" else SPEC_MAP, vocabulary[column])
+
+CACHE = ResolutionCache()
+
+# Clean Functions
+def clean_items(names, metrics):
+    """Return (original, cleaned, rule) arrays for the item_name column"""
+    codes, uniques = distinct(names)
+    with metrics.timer("normalize"):
+        original = normalize_text(uniques)
+    with metrics.timer("item_map", "item_name"):
+        mapped = original.map(ITEM_MAP)
+        rule = pd.Series(np.where(mapped.notna(), "item_map", None), dtype=object)
+    with metrics.timer("item_cleanup", "item_name"):
+        light = light_cleanup(original, ITEM_CHARS)
+
+    # Unmapped names carrying OCR junk go through the fuzzy index
+    with metrics.timer("item_fuzzy", "item_name"):
+        suspect = mapped.isna() & (light != original)
+        fuzzy, _ = fuzzy_map(original, suspect, "item_name", ocr_index("item_name"))
+        rule = rule.mask(fuzzy.notna(), "item_fuzzy")
+        mapped = mapped.fillna(fuzzy)
+
+    cleaned = mapped.fillna(light)
+    rule = rule.mask(rule.isna() & (cleaned != original), "item_cleanup")
+    return original.values[codes], cleaned.values[codes], rule.values[codes]
+
+def clean_specs(specs, item_names, metrics):
+    """Return (original, cleaned, rule) arrays for the specification column"""
+    codes, uniques = distinct(specs)
+    with metrics.timer("normalize"):
+        original = normalize_text(uniques)
+    with metrics.timer("spec_map", "specification"):
+        mapped = original.map(SPEC_MAP)
+        rule = pd.Series(np.where(mapped.notna(), "spec_map", None), dtype=object)
+
+    # Discard pure garbage, otherwise light cleanup
+    with metrics.timer("spec_garbage", "specification"):
+        garbage = original.str.count(r"[A-Za-z]") < 3
+    with metrics.timer("spec_cleanup", "specification"):
+        light = light_cleanup(original, SPEC_CHARS)
+
+    with metrics.timer("spec_fuzzy", "specification"):
+        suspect = mapped.isna() & ~garbage & (light != original)
+        fuzzy, _ = fuzzy_map(original, suspect, "specification", ocr_index("specification"))
+        rule = rule.mask(fuzzy.notna(), "spec_fuzzy")
+        mapped = mapped.fillna(fuzzy)
+
+    cleaned = mapped.fillna(light.mask(garbage, ""))
+    rule = rule.mask(rule.isna() & garbage, "spec_garbage")
+    rule = rule.mask(rule.isna() & (cleaned != original), "spec_cleanup")
+
+    original, cleaned, rule = original.values[codes], cleaned.values[codes], rule.values[codes]
 
     # Force fix for Ginger Local/Imported
-    if "ginger" in item_name.lower():
-        cleaned = "Fairly well-matured, medium (150–300 g)"
-        log.append(("specification", original, cleaned))
-        return cleaned
-
-    # Check mapping
-    if original in SPEC_MAP:
-        cleaned = SPEC_MAP[original]
-        log.append(("specification", original, cleaned))
-        return cleaned
-
-    # Discard pure garbage
-    if len(re.findall(r"[A-Za-z]", original)) < 3:
-        log.append(("specification", original, ""))
-        return ""
-
-    # Light cleanup
-    cleaned = re.sub(r"[^A-Za-z0-9(),/\-%. ]+", "", original)
-    cleaned = re.sub(r"\s+", " ", cleaned).strip()
-    if cleaned != original:
-        log.append(("specification", original, cleaned))
-    return cleaned
-
-def clean_price(val, category):
+    with metrics.timer("spec_ginger", "specification"):
+        ginger = pd.Series(item_names).str.lower().str.contains("ginger", regex=False).values
+        cleaned = np.where(ginger, GINGER_SPEC, cleaned).astype(object)
+        rule = np.where(ginger, "spec_ginger", rule).astype(object)
+    return original, cleaned, rule
+
+def clean_price_column(prices, categories, item_names, specs, metrics, detector):
+    """
+    Return (price, rule) with OCR decimal errors scaled back. Rows stream
+    through the detector in file order, so its per-item statistics only
+    ever reflect earlier rows.
+    """
+    with metrics.timer("price_parse", "price"):
+        raw = prices.astype(str).str.replace(",", "", regex=False)
+        price = pd.to_numeric(raw, errors="coerce")
+        unparsed = price.isna() & prices.notna() & (raw.str.strip().str.lower() != "nan")
+        # Rows without a category can't be checked for scale errors
+        failed = unparsed | categories.isna()
+
+    with metrics.timer("price_scale", "price"):
+        values = price.to_numpy(dtype=float, na_value=np.nan).copy()
+        rules = np.full(len(values), None, dtype=object)
+        check = detector.check
+        for i, (value, item, spec, category, skip) in enumerate(
+            zip(values, item_names, specs, categories, failed.to_numpy())
+        ):
+            if not skip:
+                values[i], rules[i] = check(value, item, spec, category)
+        price = pd.Series(values, index=prices.index).round(2).where(~failed)
+
+    rules[failed.to_numpy()] = "price_unparsed"
+    return price, rules
+
+def clean_frame(df, metrics, resolver, detector):
+    """
+    Clean an extracted frame column-wise, counting every rule into metrics.
+    resolver is the DateResolver carrying year state across frames;
+    detector the PriceDetector carrying per-item price statistics.
+    """
+    df = df.copy()
+    df.columns = [c.strip().lower() for c in df.columns]
+
+    with metrics.timer("parse_dates", "date"):
+        df["date"] = resolver.resolve(df["day"])
+    df.drop(columns=["day"], inplace=True)
+    dates = df["date"].values
+
+    original, cleaned, rule = clean_items(df["item_name"], metrics)
+    df["item_name"] = cleaned
+    metrics.record("item_name", original, cleaned, rule, dates)
+
+    original, cleaned, rule = clean_specs(df["specification"], df["item_name"], metrics)
+    df["specification"] = cleaned
+    metrics.record("specification", original, cleaned, rule, dates)
+
+    raw_prices = df["price"]
+    df["price"], rule = clean_price_column(
+        raw_prices, df["category"], df["item_name"], df["specification"], metrics, detector
+    )
+    metrics.record("price", raw_prices, df["price"], rule, dates)
+
+    # Drop Invalid
+    before = len(df)
+    df = df.dropna(subset=["date", "item_name", "price"])
+    metrics.count("rows", "rows_dropped", before - len(df), before)
+    return df
+
+def finalize(df):
+    return (
+        df.drop_duplicates()
+          .sort_values(SORT_COLUMNS)
+          .reset_index(drop=True)
+    )[OUTPUT_COLUMNS]
+
+def clean(raw_df, metrics, year=DEFAULT_YEAR, detector=None):
+    """
+    Clean a whole extracted frame in memory and return the final frame.
+    Without a detector, price statistics start from scratch.
+    """
+    return finalize(clean_frame(raw_df, metrics, DateResolver(year), detector or PriceDetector()))
+
+# Incremental watermark
+def file_digest(path, size):
+    """SHA-256 of the first `size` bytes of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        remaining = size
+        while remaining:
+            chunk = f.read(min(1 << 20, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+def read_watermark():
+    if not WATERMARK_FILE.exists():
+        return None
     try:
-        price = float(str(val).replace(",", ""))
-        if price > 2000:
-            price = price / 100
-        if category.upper() in {"LOWLAND VEGETABLES", "FRUITS", "SPICES"} and price > 1000:
-            price = price / 10
-        return round(price, 2)
-    except:
-        log.append(("price", val, None))
+        return json.loads(WATERMARK_FILE.read_text())
+    except ValueError:
         return None
 
-# Apply Cleaning
-df["item_name"] = df["item_name"].apply(clean_item)
-df["specification"] = df.apply(lambda r: clean_spec(r["specification"], r["item_name"]), axis=1)
-df["price"] = df.apply(lambda r: clean_price(r["price"], r["category"]), axis=1)
-
-# Drop Invalid
-before = len(df)
-df = df.dropna(subset=["date", "item_name", "price"])
-after = len(df)
-if before != after:
-    log.append(("rows_dropped", before, after))
-
-# Finalize
-df = (
-    df.drop_duplicates()
-      .sort_values(["date", "category", "item_name", "price"])
-      .reset_index(drop=True)
-)
-df = df[["date", "category", "item_name", "specification", "price"]]
-
-OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
-df.to_csv(OUTPUT_FILE, index=False)
-
-if log:
-    pd.DataFrame(log, columns=["field", "original", "cleaned"]).to_csv(LOG_FILE, index=False)
-
-print("Cleaning finished")
-print(f"cleaned_prices.csv saved ({len(df)} rows)")
-print(f"cleaning_log.csv written")
+def write_watermark(last_date):
+    size = INPUT_FILE.stat().st_size
+    WATERMARK_FILE.write_text(json.dumps({
+        "input_bytes": size,
+        "input_sha256": file_digest(INPUT_FILE, size),
+        "last_date": None if pd.isna(last_date) else str(pd.Timestamp(last_date).date()),
+    }, indent=2))
+
+def read_new_rows(watermark):
+    """
+    Return only the rows appended to INPUT_FILE since the watermark,
+    or None when the already-cleaned prefix changed and a full run is needed
+    """
+    if watermark is None or not storage.dataset_exists("cleaned_prices"):
+        return None
+    offset = watermark["input_bytes"]
+    if INPUT_FILE.stat().st_size < offset:
+        return None
+    if file_digest(INPUT_FILE, offset) != watermark["input_sha256"]:
+        return None
+    with open(INPUT_FILE, "rb") as f:
+        header = f.readline()
+        f.seek(offset - 1)
+        if f.read(1) != b"\n":
+            return None
+        tail = f.read()
+    return pd.read_csv(io.BytesIO(header + tail))
+
+def merge_cleaned(new_df, last_date):
+    """
+    Add newly cleaned rows to the cleaned dataset. Rows strictly after the
+    watermark date are appended as-is; anything older forces a
+    re-sort and dedup against the existing output.
+    """
+    if last_date is not None and (new_df["date"] > pd.Timestamp(last_date)).all():
+        storage.append_dataset(new_df, "cleaned_prices")
+        return
+    existing = storage.read_dataset("cleaned_prices")
+    merged = finalize(pd.concat([existing, new_df], ignore_index=True))
+    storage.write_dataset(merged, "cleaned_prices")
+
+# Streaming
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_key(row):
+    date, category, item_name, specification, price = row
+    return date, category, item_name, float(price), specification
+
+def run_streaming(chunksize, metrics, resolver, detector):
+    """
+    Clean INPUT_FILE chunk by chunk. Each chunk is deduped, sorted and
+    spilled to a temporary run file; the runs are then combined with an
+    external merge, so memory is bounded by the chunk size rather than
+    the input size.
+    """
+    OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
+    last_date = pd.NaT
+
+    with tempfile.TemporaryDirectory(dir=OUTPUT_FILE.parent) as work_dir:
+        runs = []
+        for i, chunk in enumerate(pd.read_csv(INPUT_FILE, chunksize=chunksize)):
+            df = clean_frame(chunk, metrics, resolver, detector)
+            df = (
+                df.drop_duplicates()
+                  .sort_values(SORT_COLUMNS + ["specification"])
+            )[OUTPUT_COLUMNS]
+            if not df.empty:
+                run = Path(work_dir) / f"run_{i}.csv"
+                df.to_csv(run, index=False)
+                runs.append(run)
+                last_date = max(last_date, df["date"].max()) if pd.notna(last_date) else df["date"].max()
+
+        rows = external_merge(runs, OUTPUT_FILE, OUTPUT_COLUMNS, run_key, work_dir)
+
+    if storage.use_parquet():
+        # Convert the merged CSV chunk by chunk to keep memory bounded
+        storage.remove_dataset("cleaned_prices")
+        for chunk in storage.iter_csv_chunks("cleaned_prices", chunksize):
+            storage.append_dataset(chunk, "cleaned_prices")
+
+    print(f"cleaned_prices.csv saved ({rows} rows, {len(runs)} chunks)")
+    print(f"Peak RSS: {peak_rss_mb():.1f} MB")
+    return last_date
+
+def run_full(metrics, detector, year=DEFAULT_YEAR, chunksize=None):
+    if chunksize:
+        return run_streaming(chunksize, metrics, DateResolver(year), detector)
+
+    df = clean(pd.read_csv(INPUT_FILE), metrics, year, detector)
+    storage.write_dataset(df, "cleaned_prices")
+
+    print(f"cleaned prices saved ({len(df)} rows)")
+    return df["date"].max()
+
+def run_incremental(watermark, new_rows, metrics, detector):
+    last_date = watermark["last_date"]
+    if new_rows.empty:
+        print("No new rows since last run")
+        return last_date
+
+    # Yearless days continue counting from the watermark date
+    resolver = DateResolver.after(last_date)
+    df = finalize(clean_frame(new_rows, metrics, resolver, detector))
+    merge_cleaned(df, last_date)
+
+    print(f"cleaned prices updated (+{len(df)} rows)")
+    if df.empty:
+        return last_date
+    return max(pd.Timestamp(last_date), df["date"].max()) if last_date else df["date"].max()
+
+def finish_run(last_date, metrics, detector, merge=False):
+    """
+    Bookkeeping after every run that wrote cleaned_prices: the watermark,
+    the detector state and OCR cache the next incremental run continues
+    from, and the cleaning log. Returns the log frame.
+    """
+    write_watermark(last_date)
+    detector.save()
+    CACHE.save()
+    return metrics.write(LOG_FILE, RULES_FILE, merge=merge)
+
+# Run Cleaning
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean extracted Bantay Presyo prices")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only clean rows appended since the last run")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="stream the input in chunks of this many rows")
+    parser.add_argument("--year", type=int, default=DEFAULT_YEAR,
+                        help="year for leading days that carry no year of their own")
+    args = parser.parse_args()
+
+    metrics = CleaningMetrics()
+    watermark = read_watermark() if args.incremental else None
+    new_rows = read_new_rows(watermark)
+    if new_rows is None:
+        if args.incremental:
+            print("No usable watermark, cleaning everything")
+        # Full runs replay the whole history, so price statistics start fresh
+        detector = PriceDetector()
+        last_date = run_full(metrics, detector, args.year, args.chunksize)
+    else:
+        detector = PriceDetector.load()
+        last_date = run_incremental(watermark, new_rows, metrics, detector)
+
+    log = finish_run(last_date, metrics, detector, merge=new_rows is not None)
+
+    print("Cleaning finished")
+    print(f"cleaning_log.csv written ({len(log)} distinct corrections)")
+    print(metrics.rule_summary().head(5).to_string(index=False))
@@ -0,0 +1,117 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+import time
+import numpy as np
+import pandas as pd
+
+LOG_COLUMNS = ["field", "original", "cleaned", "rule", "count", "first_seen", "last_seen"]
+RULE_COLUMNS = ["rule", "field", "hits", "rows", "hit_rate", "seconds"]
+LOG_KEYS = ["field", "original", "cleaned", "rule"]
+COMPACT_EVERY = 32
+
+class CleaningMetrics:
+    """
+    Aggregated cleaning log. Each (field, original, cleaned, rule)
+    transformation is kept once with an occurrence count and the first/last
+    date it was seen; per-rule hit counts and step timings are kept alongside.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.hits = defaultdict(int)
+        self.rows = defaultdict(int)
+        self.rule_fields = {}
+        self.seconds = defaultdict(float)
+
+    @contextmanager
+    def timer(self, step, field=None):
+        if field:
+            self.rule_fields[step] = field
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[step] += time.perf_counter() - start
+
+    def record(self, field, original, cleaned, rules, dates):
+        """
+        Count the transformations of one column. `rules` holds the rule
+        name applied to each row, or None where the value was untouched.
+        """
+        rules = pd.Series(np.asarray(rules, dtype=object))
+        self.rows[field] += len(rules)
+        hit = rules.notna().values
+        if not hit.any():
+            return
+        frame = pd.DataFrame({
+            "original": np.asarray(original, dtype=object)[hit],
+            "cleaned": np.asarray(cleaned, dtype=object)[hit],
+            "rule": rules.values[hit],
+            "date": np.asarray(dates)[hit],
+        })
+        for rule, n in frame["rule"].value_counts().items():
+            self.hits[rule] += int(n)
+            self.rule_fields[rule] = field
+        grouped = (
+            frame.groupby(["original", "cleaned", "rule"], dropna=False, sort=False)["date"]
+                 .agg(count="size", first_seen="min", last_seen="max")
+                 .reset_index()
+        )
+        grouped.insert(0, "field", field)
+        self.entries.append(grouped)
+        # Keep memory flat across many chunks
+        if len(self.entries) > COMPACT_EVERY:
+            self.entries = [self.log()]
+
+    def count(self, field, rule, hits, rows):
+        """Count a rule that has no per-value detail, like dropped rows"""
+        self.rows[field] += rows
+        self.hits[rule] += hits
+        self.rule_fields[rule] = field
+
+    def log(self):
+        if not self.entries:
+            return pd.DataFrame(columns=LOG_COLUMNS)
+        return combine_logs(pd.concat(self.entries, ignore_index=True))
+
+    def rule_summary(self):
+        rules = list(dict.fromkeys(list(self.hits) + list(self.seconds)))
+        summary = pd.DataFrame({
+            "rule": rules,
+            "field": [self.rule_fields.get(r, "") for r in rules],
+            "hits": [self.hits.get(r, 0) for r in rules],
+            "seconds": [round(self.seconds.get(r, 0.0), 6) for r in rules],
+        })
+        summary["rows"] = summary["field"].map(self.rows).fillna(0).astype(int)
+        summary["hit_rate"] = (summary["hits"] / summary["rows"].where(summary["rows"] > 0)).round(4)
+        return summary[RULE_COLUMNS].sort_values("seconds", ascending=False, ignore_index=True)
+
+    def write(self, log_path, rules_path, merge=False):
+        """
+        Write the aggregated log and per-rule summary. With merge, counts
+        are added onto an existing log (incremental runs).
+        """
+        log = self.log()
+        log_path = Path(log_path)
+        if merge and log_path.exists():
+            previous = pd.read_csv(log_path, parse_dates=["first_seen", "last_seen"])
+            if list(previous.columns) == LOG_COLUMNS:
+                log = combine_logs(pd.concat([previous, log], ignore_index=True))
+        log.to_csv(log_path, index=False)
+        self.rule_summary().to_csv(rules_path, index=False)
+        return log
+
+def combine_logs(log):
+    """Re-aggregate log rows that share a transformation key"""
+    log = log.copy()
+    # Raw prices may be numbers in one chunk and text in another,
+    # and empty strings come back from CSV as NaN
+    for col in ["original", "cleaned"]:
+        log[col] = log[col].fillna("").astype(str)
+    return (
+        log.groupby(LOG_KEYS, dropna=False, sort=False)
+           .agg(count=("count", "sum"), first_seen=("first_seen", "min"), last_seen=("last_seen", "max"))
+           .reset_index()
+           .sort_values(["field", "count"], ascending=[True, False], ignore_index=True)
+    )[LOG_COLUMNS]
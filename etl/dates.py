@@ -0,0 +1,96 @@
+import calendar
+import re
+import pandas as pd
+
+DEFAULT_YEAR = 2025
+
+MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+
+DAY_RE = re.compile(r"^([A-Za-z]+)\.?\s+(\d{1,2})(?:,?\s+(\d{4}))?$")
+ISO_RE = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})$")
+
+def split_day(text):
+    """Parse one day string into (year or None, month, day), or None if unreadable"""
+    text = str(text).strip()
+    match = ISO_RE.match(text)
+    if match:
+        year, month, day = (int(g) for g in match.groups())
+        return year, month, day
+    match = DAY_RE.match(text)
+    if match and match.group(1).lower() in MONTHS:
+        year = int(match.group(3)) if match.group(3) else None
+        return year, MONTHS[match.group(1).lower()], int(match.group(2))
+    return None
+
+class DateResolver:
+    """
+    Turns the extracted `day` column into dates in one vectorized pass.
+
+    Each distinct day string is split into (year, month, day) once and
+    cached. Rows without a year take it from the nearest explicit year
+    above them (or base_year), then pick the year that puts them nearest
+    the previous row: a month jumping backwards by more than six months
+    (December to January) moves to the next year, one jumping forwards
+    by more than six months (January back to December, e.g. a second
+    Dec-Jan sheet or a December backfill) to the previous one. State
+    carries over between calls, so chunked and incremental runs keep
+    counting years correctly.
+    """
+
+    def __init__(self, base_year=DEFAULT_YEAR, last_month=None):
+        self.year = base_year
+        self.month = last_month
+        self.cache = {}
+
+    @classmethod
+    def after(cls, last_date, base_year=DEFAULT_YEAR):
+        """Continue from the last cleaned date (incremental runs)"""
+        if last_date is None or pd.isna(last_date):
+            return cls(base_year)
+        last_date = pd.Timestamp(last_date)
+        return cls(last_date.year, last_date.month)
+
+    def split(self, uniques):
+        for text in uniques:
+            if text not in self.cache:
+                self.cache[text] = split_day(text)
+        parts = [self.cache[text] or (None, None, None) for text in uniques]
+        years, months, days = zip(*parts) if parts else ((), (), ())
+        return (
+            pd.array(years, dtype="Int64"),
+            pd.array(months, dtype="Int64"),
+            pd.array(days, dtype="Int64"),
+        )
+
+    def resolve(self, day):
+        codes, uniques = pd.factorize(day, use_na_sentinel=False)
+        years, months, days = self.split(uniques)
+        explicit = pd.Series(years[codes], index=day.index)
+        month = pd.Series(months[codes], index=day.index)
+        dom = pd.Series(days[codes], index=day.index)
+
+        valid = month.notna()
+        prev_month = month.where(valid).ffill().shift(1)
+        if self.month is not None:
+            prev_month = prev_month.fillna(self.month)
+        yearless = valid & explicit.isna()
+        rollover = yearless & (prev_month - month > 6).fillna(False)
+        rollback = yearless & (month - prev_month > 6).fillna(False)
+
+        # Years restart at every explicit year; each step counts from there
+        segment = explicit.notna().cumsum()
+        anchor = explicit.ffill().fillna(self.year)
+        step = rollover.astype(int) - rollback.astype(int)
+        year = anchor + step.groupby(segment).cumsum()
+        year = explicit.fillna(year)
+
+        dates = pd.to_datetime(
+            pd.DataFrame({"year": year, "month": month, "day": dom}).astype("float64"),
+            errors="coerce",
+        )
+
+        if valid.any():
+            last = valid[valid].index[-1]
+            self.year, self.month = int(year[last]), int(month[last])
+        return dates
@@ -1,28 +1,58 @@
 # The DB port is for both local/cloud (although you can just use local)
+# One process-wide connection pool is shared by the loader, the trainer and
+# every dashboard session, so connections are opened once and reused.
+# NOCHE_DB_BACKEND=duckdb swaps Postgres for an embedded DuckDB file with the
+# same star schema: no server to start, columnar aggregation in-process.
 
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
 from urllib.parse import urlparse, urlunparse, parse_qs, urlencode
-import streamlit as st
 import os
+import re
+import threading
+import time
 
-def get_engine():
+import psycopg2
+import psycopg2.extras
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+from psycopg2.pool import PoolError
+from sqlalchemy import create_engine
+
+DB_BACKEND = os.getenv("NOCHE_DB_BACKEND", "postgres").lower()
+DUCKDB_FILE = os.getenv("NOCHE_DUCKDB_FILE", "data/processed/nochebuena.duckdb")
+DUCKDB_SCHEMA = Path(__file__).resolve().parents[1] / "sql" / "create_tables_duckdb.sql"
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+# Idle connections older than this are pinged on checkout (0: always), since
+# a server-side disconnect (pgbouncer/Supabase idle timeout) isn't visible
+# in conn.closed until the next query fails
+POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", 30))
+
+def database_url():
     """
-    Return SQLAlchemy engine, using:
+    Return the database URL, using:
     1. Streamlit secrets for Supabase
     2. Local Postgres fallback
     """
-    secrets = st.secrets if hasattr(st, "secrets") else {}
+    # Streamlit is only needed for its secrets; the ETL runs without it
+    try:
+        import streamlit as st
+        secrets = st.secrets if hasattr(st, "secrets") else {}
+        has_url = "database" in secrets and "url" in secrets["database"]
+    except Exception:
+        has_url = False
 
     # 1️⃣ Supabase / Cloud
-    if "database" in secrets and "url" in secrets["database"]:
+    if has_url:
         url = secrets["database"]["url"]
         # Clean pgbouncer query if present
         parsed = urlparse(url)
         query_params = parse_qs(parsed.query)
         query_params.pop("pgbouncer", None)
         new_query = urlencode(query_params, doseq=True)
-        cleaned_url = urlunparse(parsed._replace(query=new_query))
-        return create_engine(cleaned_url, pool_pre_ping=True)
+        return urlunparse(parsed._replace(query=new_query))
 
     # 2️⃣ Local fallback
     LOCAL_DB = {
@@ -32,5 +62,326 @@ def get_engine():
         "user": os.getenv("DB_USER", "noche_user"),
         "password": os.getenv("DB_PASSWORD", ""),
     }
-    url = f"postgresql://{LOCAL_DB['user']}:{LOCAL_DB['password']}@{LOCAL_DB['host']}:{LOCAL_DB['port']}/{LOCAL_DB['dbname']}"
-    return create_engine(url, pool_pre_ping=True)
+    return f"postgresql://{LOCAL_DB['user']}:{LOCAL_DB['password']}@{LOCAL_DB['host']}:{LOCAL_DB['port']}/{LOCAL_DB['dbname']}"
+
+@lru_cache(maxsize=1)
+def get_engine():
+    """Return the shared SQLAlchemy engine (built once per process)"""
+    return create_engine(database_url(), pool_pre_ping=True, pool_size=POOL_SIZE)
+
+# Connection pool
+class ConnectionPool:
+    """
+    Thread-safe pool of up to `size` psycopg2 connections, opened lazily.
+    Checkouts block (up to timeout seconds) while all connections are in
+    use instead of failing; reuse/wait counters are kept for pool_stats().
+    A connection idle for more than ping_after seconds is checked with
+    SELECT 1 before it is handed out and replaced if the server dropped it.
+    """
+
+    def __init__(self, dsn, size=POOL_SIZE, timeout=POOL_TIMEOUT, ping_after=POOL_PING_AFTER):
+        self.dsn = dsn
+        self.size = size
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.idle = []  # (connection, time it was released)
+        self.slots = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        self.stats = {
+            "checkouts": 0,
+            "opened": 0,
+            "reused": 0,
+            "discarded": 0,
+            "pinged": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "in_use": 0,
+        }
+
+    def acquire(self):
+        start = time.perf_counter()
+        if not self.slots.acquire(timeout=self.timeout):
+            raise PoolError(f"no connection free after {self.timeout}s (pool size {self.size})")
+        waited = time.perf_counter() - start
+
+        conn = self.checkout_idle()
+        reused = conn is not None
+        if not reused:
+            try:
+                conn = psycopg2.connect(self.dsn)
+            except Exception:
+                self.slots.release()
+                raise
+
+        with self.lock:
+            stats = self.stats
+            stats["checkouts"] += 1
+            stats["in_use"] += 1
+            stats["reused" if reused else "opened"] += 1
+            if waited > 0.001:
+                stats["waits"] += 1
+            stats["wait_seconds"] += waited
+            stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+        return conn
+
+    def checkout_idle(self):
+        """Most recently released idle connection that is still alive, or None"""
+        while True:
+            with self.lock:
+                if not self.idle:
+                    return None
+                conn, released = self.idle.pop()
+            alive = not conn.closed
+            if alive and time.monotonic() - released >= self.ping_after:
+                alive = self.ping(conn)
+            if alive:
+                return conn
+            with self.lock:
+                self.stats["discarded"] += 1
+
+    def ping(self, conn):
+        with self.lock:
+            self.stats["pinged"] += 1
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            conn.close()
+            return False
+
+    def release(self, conn):
+        # Hand connections back idle; anything left open is rolled back
+        keep = not conn.closed
+        if keep:
+            status = conn.info.transaction_status
+            if status == TRANSACTION_STATUS_UNKNOWN:
+                conn.close()
+                keep = False
+            elif status != TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        with self.lock:
+            self.stats["in_use"] -= 1
+            if keep:
+                self.idle.append((conn, time.monotonic()))
+            else:
+                self.stats["discarded"] += 1
+        self.slots.release()
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn, _ in idle:
+            conn.close()
+
+class PooledConnection:
+    """psycopg2 connection whose close() hands it back to the pool"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def close(self):
+        if self._conn is not None:
+            self._pool.release(self._conn)
+            self._conn = None
+
+# Embedded DuckDB backend
+# The loader and readers are written against psycopg2; these wrappers give a
+# DuckDB connection the same cursor API and rewrite the few Postgres-only
+# bits of syntax they use.
+DUCKDB_REWRITES = [
+    (re.compile(r"CREATE TEMP TABLE (IF NOT EXISTS )?"), "CREATE OR REPLACE TEMP TABLE "),
+    (re.compile(r"\s+ON COMMIT DROP"), ""),
+    (re.compile(r"%s"), "?"),
+]
+DML_RE = re.compile(r"^\s*(INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+
+def duckdb_sql(query):
+    for pattern, replacement in DUCKDB_REWRITES:
+        query = pattern.sub(replacement, query)
+    return query
+
+class DuckDBCursor:
+    """psycopg2-style cursor over a DuckDB connection"""
+
+    def __init__(self, con):
+        self.con = con
+        self.rowcount = -1
+        self.description = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        result = self.con.execute(duckdb_sql(query), params)
+        self.description = result.description
+        self.rowcount = -1
+        if DML_RE.match(query) and self.description and self.description[0][0] == "Count":
+            self.rowcount = result.fetchone()[0]
+            self.description = None
+        return self
+
+    def execute_values(self, query, rows):
+        if not rows:
+            return
+        placeholders = "(" + ", ".join(["?"] * len(rows[0])) + ")"
+        self.con.executemany(duckdb_sql(query.replace("VALUES %s", f"VALUES {placeholders}")), rows)
+
+    def insert_frame(self, table, frame):
+        """Bulk insert a DataFrame (DuckDB scans it in place, no CSV round trip)"""
+        columns = ", ".join(frame.columns)
+        self.con.register("_insert_frame", frame)
+        try:
+            self.con.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM _insert_frame")
+        finally:
+            self.con.unregister("_insert_frame")
+        return len(frame)
+
+    def fetchone(self):
+        return self.con.fetchone()
+
+    def fetchall(self):
+        return self.con.fetchall()
+
+    def close(self):
+        pass
+
+class DuckDBConnection:
+    """psycopg2-style connection; `with conn:` wraps the block in a transaction"""
+
+    def __init__(self, con):
+        self.con = con
+
+    def cursor(self):
+        return DuckDBCursor(self.con)
+
+    def commit(self):
+        pass  # statements outside `with conn:` autocommit
+
+    def rollback(self):
+        pass
+
+    def __enter__(self):
+        self.con.begin()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.con.commit()
+        else:
+            self.con.rollback()
+        return False
+
+    def close(self):
+        self.con.close()
+
+_duckdb = None
+
+def duckdb_database():
+    """Open the DuckDB file once per process, creating the schema on first use"""
+    global _duckdb
+    with _pool_lock:
+        if _duckdb is None:
+            import duckdb
+            if DUCKDB_FILE != ":memory:":
+                Path(DUCKDB_FILE).parent.mkdir(parents=True, exist_ok=True)
+            _duckdb = duckdb.connect(DUCKDB_FILE)
+            _duckdb.execute(DUCKDB_SCHEMA.read_text())
+    return _duckdb
+
+def execute_values(cur, query, rows):
+    """psycopg2.extras.execute_values that also works on the DuckDB backend"""
+    if isinstance(cur, DuckDBCursor):
+        return cur.execute_values(query, rows)
+    return psycopg2.extras.execute_values(cur, query, rows)
+
+_pool = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+def init_pool(dsn=None, size=None):
+    """(Re)create the process-wide pool, e.g. to point at a test database"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(dsn or database_url(), size or POOL_SIZE)
+    return _pool
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(database_url())
+    return _pool
+
+def get_connection():
+    """Check a connection out of the pool; close() returns it"""
+    if DB_BACKEND == "duckdb":
+        # Each cursor() is a separate connection to the shared database
+        return DuckDBConnection(duckdb_database().cursor())
+    pool = get_pool()
+    return PooledConnection(pool, pool.acquire())
+
+@contextmanager
+def connection():
+    """
+    Borrow a pooled connection for the block. Inside transaction(),
+    the transaction's connection is handed out instead.
+    """
+    active = getattr(_local, "conn", None)
+    if active is not None:
+        yield active
+        return
+    conn = get_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+@contextmanager
+def transaction():
+    """
+    Run the block in a single transaction: committed at the end, rolled
+    back on error. Nested transaction()/connection() blocks on the same
+    thread join it, so a whole load commits once.
+    """
+    active = getattr(_local, "conn", None)
+    if active is not None:
+        yield active
+        return
+    with connection() as conn:
+        _local.conn = conn
+        try:
+            with conn:
+                yield conn
+        finally:
+            _local.conn = None
+
+def pool_stats():
+    """Counters for connection reuse and time spent waiting for the pool"""
+    if _pool is None:
+        return {}
+    with _pool.lock:
+        stats = dict(_pool.stats)
+    stats["size"] = _pool.size
+    stats["wait_seconds"] = round(stats["wait_seconds"], 6)
+    stats["max_wait_seconds"] = round(stats["max_wait_seconds"], 6)
+    return stats
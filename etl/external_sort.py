@@ -0,0 +1,51 @@
+from pathlib import Path
+import csv
+import heapq
+
+MAX_FANIN = 64
+
+def read_run(path, key):
+    """Yield (key, row) from a sorted CSV run, skipping its header"""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            yield key(row), row
+
+def merge_runs(paths, out_path, header, key):
+    """
+    k-way merge of sorted CSV runs into out_path, dropping rows identical
+    to the previous one. Only one row per run is held in memory.
+    """
+    written = 0
+    previous = None
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(header)
+        for _, row in heapq.merge(*(read_run(p, key) for p in paths), key=lambda kr: kr[0]):
+            if row == previous:
+                continue
+            writer.writerow(row)
+            previous = row
+            written += 1
+    return written
+
+def external_merge(paths, out_path, header, key, work_dir):
+    """
+    Merge any number of sorted runs, in passes of at most MAX_FANIN files
+    so open file handles stay bounded. Returns the number of rows written.
+    """
+    paths = [Path(p) for p in paths]
+    work_dir = Path(work_dir)
+    level = 0
+    while len(paths) > MAX_FANIN:
+        merged = []
+        for i in range(0, len(paths), MAX_FANIN):
+            target = work_dir / f"merge_{level}_{i // MAX_FANIN}.csv"
+            merge_runs(paths[i:i + MAX_FANIN], target, header, key)
+            merged.append(target)
+        for p in paths:
+            p.unlink()
+        paths = merged
+        level += 1
+    return merge_runs(paths, out_path, header, key)
@@ -1,144 +1,162 @@
-from pathlib import Path
-import pandas as pd
+import argparse
+import csv
+import hashlib
+import json
+import os
 import re
-import unicodedata
-
-# Paths
-INPUT_FILE = Path("data/processed/extracted_prices.csv")
-OUTPUT_FILE = Path("data/processed/cleaned_prices.csv")
-LOG_FILE = Path("data/processed/cleaning_log.csv")
-
-# Loads
-df = pd.read_csv(INPUT_FILE)
-df.columns = [c.strip().lower() for c in df.columns]
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
-log = []
+from pypdf import PdfReader
 
-# Date parsing
-def parse_date(day):
-    try:
-        return pd.to_datetime(f"{day} 2025", format="%B %d %Y")
-    except:
-        return pd.NaT
-
-df["date"] = df["day"].apply(parse_date)
-df.drop(columns=["day"], inplace=True)
-
-# OCR Dictionaries
-ITEM_MAP = {
-    "Eg‘r;':IPlcmc Shoulder (Kasim),": "Pork Picnic Shoulder, Local (Kasim)",
-    "Eg‘r;':IPicnic Shoulder (Kasim),": "Pork Picnic Shoulder, Local (Kasim)",
-    "r;;l;rtx::w Shoulder (Kasim),": "Pork Picnic Shoulder, Imported (Kasim)",
-    "T:::i:gl (Yellow-Fin Tuna),": "Tambakol (Yellow-Fin Tuna) Imported",
-    "Sen el (Rl Flnslun).": "Tambakol (Yellow-Fin Tuna) Local",
-    "g‘;::;’;g Oil (Palm Olein, Jolly": "Cooking Oil (Palm Olein, Jolly)",
-    "Cooking 0Oil (Palm)": "Cooking Oil (Palm)",
-    "Garlic, Native/Local": "Garlic, Native/Local",
-    "Habichuelas/Baguio Beans, Local": "Habichuelas/Baguio Beans, Local",
-    "Jasponica/Japonica Rice": "Jasponica/Japonica Rice",
-    "Pork Rind/Skin, Local": "Pork Rind/Skin, Local",
-    "Chicken Rind/Skin, Local": "Chicken Rind/Skin, Local"
-}
-
-SPEC_MAP = {
-    "fifif?fi’;ffiig&\"fi. i": "Medium (8–10 cm diameter/bunch hd)",
-    "ffig. i": "Medium (8–10 cm diameter/bunch hd)",
-    "(ffig. i)": "Medium (8–10 cm diameter/bunch hd)",
-    "m:?r::?;r(/%::ciﬂx 4": "Medium (8–10 cm diameter/bunch hd)",
-    "mrr(/%cix 4": "Medium (8–10 cm diameter/bunch hd)",
-    "E‘f ;‘g’_’;gg\"g':; uiked, Medtiti": "Fairly well-matured, medium (150–300 g)",
-    "ff ;‘g’_’ 3‘3'?;:; tured, Medium": "Fairly well-matured, medium (150–300 g)",
-    "'(:f;g’_’a,\"\"(‘)';';:]amred' Medium": "Fairly well-matured, medium (150–300 g)",
-    "(fga,()amred Medium": "Fairly well-matured, medium (150–300 g)",
-    "(l\\idx:ir::::r(/i(:}r;:hs g;]m": "Medium (301–450 g/bunch)",
-    "10-12 pes/kg": "10–12 pcs/kg",
-    "13-15 pes/kg": "13–15 pcs/kg",
-    "15-18 pes/kg": "15–18 pcs/kg",
-    "1,000 mi/bottle": "1,000 ml/bottle",
-    "5% broken": "5% broken",
-    "20-40% bran streak": "20-40% bran streak",
-    "1-19% bran streak": "1-19 bran streak"
-}
-
-# Normalize text
-def normalize_text(text):
-    if pd.isna(text):
-        return ""
-    text = str(text).strip()
-    # Remove leading/trailing quotes and invisible unicode characters
-    text = re.sub(r"^[\"'‘’“”]+|[\"'‘’“”]+$", "", text)
-    text = unicodedata.normalize("NFKD", text)
-    # Collapse whitespace
-    text = re.sub(r"\s+", " ", text)
-    return text
-
-# Clean functions
-def clean_item(name):
-    original = normalize_text(name)
-    cleaned = ITEM_MAP.get(original)
-    if cleaned:
-        log.append(("item_name", original, cleaned))
-        return cleaned
-    # Fallback: light cleanup
-    cleaned = re.sub(r"[^A-Za-z0-9(),/\- ]+", "", original).strip()
-    if cleaned != original:
-        log.append(("item_name", original, cleaned))
-    return cleaned
-
-def clean_spec(spec):
-    original = normalize_text(spec)
-    cleaned = SPEC_MAP.get(original)
-    if cleaned:
-        log.append(("specification", original, cleaned))
-        return cleaned
-    # Discard garbage
-    if len(re.findall(r"[A-Za-z]", original)) < 3:
-        log.append(("specification", original, ""))
-        return ""
-    # Light cleanup
-    cleaned = re.sub(r"[^A-Za-z0-9(),/\-%. ]+", "", original).strip()
-    if cleaned != original:
-        log.append(("specification", original, cleaned))
-    return cleaned
-
-def clean_price(val, category):
+# Paths
+RAW_DIR = Path("data/raw")
+OUTPUT_FILE = Path("data/processed/extracted_prices.csv")
+MANIFEST_FILE = Path("data/processed/extract_manifest.json")
+
+OUTPUT_COLUMNS = ["day", "category", "item_name", "specification", "price"]
+PAGES_PER_TASK = 4
+
+# Line patterns
+MONTHS = "January|February|March|April|May|June|July|August|September|October|November|December"
+DATE_RE = re.compile(rf"\b({MONTHS})\s+(\d{{1,2}})(?:,?\s+(\d{{4}}))?\b", re.IGNORECASE)
+PRICE_RE = re.compile(r"^\d[\d,]*(\.\d+)?$")
+HEADER_RE = re.compile(r"BANTAY PRESYO|COMMODITY|SPECIFICATION|PREVAILING|RETAIL PRICE", re.IGNORECASE)
+CELL_SPLIT = re.compile(r"\s{2,}")
+
+# Page parsing
+def parse_page_text(text):
+    """
+    Turn the layout text of one page into ordered events:
+    ("day", "December 11, 2025"), ("category", "FRUITS") or
+    ("row", item_name, specification, price).
+    Table cells are separated by runs of 2+ spaces in layout mode.
+    """
+    events = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+
+        date = DATE_RE.search(line)
+        if date:
+            # Keep the year when the sheet prints one; the cleaner infers it otherwise
+            day = f"{date.group(1).title()} {int(date.group(2))}"
+            if date.group(3):
+                day += f", {date.group(3)}"
+            events.append(("day", day))
+            continue
+        if HEADER_RE.search(line):
+            continue
+
+        cells = CELL_SPLIT.split(line)
+        if len(cells) >= 2 and PRICE_RE.match(cells[-1]):
+            spec = " ".join(cells[1:-1]) or "n/a"
+            events.append(("row", cells[0], spec, cells[-1]))
+        elif line == line.upper() and any(c.isalpha() for c in line):
+            events.append(("category", line))
+    return events
+
+_READERS = {}
+
+def extract_pages(task):
+    """Worker: extract and parse a batch of pages from one PDF"""
+    path, pages = task
+    reader = _READERS.get(path)
+    if reader is None:
+        reader = _READERS[path] = PdfReader(path)
+    return path, [parse_page_text(reader.pages[p].extract_text(extraction_mode="layout")) for p in pages]
+
+# Manifest
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def read_manifest():
+    if not MANIFEST_FILE.exists():
+        return {}
     try:
-        price = float(str(val).replace(",", ""))
-        if price > 2000:
-            price = price / 100
-        if category.upper() in {"LOWLAND VEGETABLES", "FRUITS", "SPICES"} and price > 1000:
-            price = price / 10
-        return round(price, 2)
-    except:
-        log.append(("price", val, None))
-        return None
-
-# Apply cleaning
-df["item_name"] = df["item_name"].apply(clean_item)
-df["specification"] = df["specification"].apply(clean_spec)
-df["price"] = df.apply(lambda r: clean_price(r["price"], r["category"]), axis=1)
-
-# Drop invalid
-before = len(df)
-df = df.dropna(subset=["date", "item_name", "price"])
-after = len(df)
-if before != after:
-    log.append(("rows_dropped", before, after))
-
-# Finalize
-df = (
-    df.drop_duplicates()
-      .sort_values(["date", "category", "item_name", "price"])
-      .reset_index(drop=True)
-)
-df = df[["date", "category", "item_name", "specification", "price"]]
-
-OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
-df.to_csv(OUTPUT_FILE, index=False)
-
-if log:
-    pd.DataFrame(log, columns=["field", "original", "cleaned"]).to_csv(LOG_FILE, index=False)
-
-print("Cleaning finished")
-print(f"cleaned_prices.csv saved ({len(df)} rows)")
-print(f"cleaning_log.csv written")
+        return json.loads(MANIFEST_FILE.read_text())
+    except ValueError:
+        return {}
+
+def write_manifest(manifest):
+    MANIFEST_FILE.write_text(json.dumps(manifest, indent=2))
+
+# Extraction
+def pending_pdfs(manifest):
+    """Return [(path, sha256)] for PDFs in RAW_DIR not yet extracted"""
+    pending = []
+    for path in sorted(RAW_DIR.glob("*.pdf")):
+        digest = file_sha256(path)
+        if digest not in manifest:
+            pending.append((path, digest))
+    return pending
+
+def build_tasks(pdfs):
+    tasks = []
+    for path, _ in pdfs:
+        n_pages = len(PdfReader(str(path)).pages)
+        for start in range(0, n_pages, PAGES_PER_TASK):
+            tasks.append((str(path), list(range(start, min(start + PAGES_PER_TASK, n_pages)))))
+    return tasks
+
+def extract(workers=None, rebuild=False):
+    """
+    Extract every new PDF in RAW_DIR, appending rows to OUTPUT_FILE as
+    page batches finish. Day and category carry over between pages, so
+    results are consumed in page order. rebuild re-extracts every PDF into
+    a fresh OUTPUT_FILE, but only when there is at least one to extract.
+    """
+    manifest = {} if rebuild else read_manifest()
+    pdfs = pending_pdfs(manifest)
+    if not pdfs:
+        print(f"No {'' if rebuild else 'new '}PDFs to extract in {RAW_DIR}")
+        return 0
+    if rebuild:
+        OUTPUT_FILE.unlink(missing_ok=True)
+
+    OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
+    write_header = not OUTPUT_FILE.exists()
+    hashes = {str(path): digest for path, digest in pdfs}
+    rows_per_pdf = dict.fromkeys(hashes, 0)
+    state = {}
+
+    with open(OUTPUT_FILE, "a", newline="", encoding="utf-8") as f, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        writer = csv.writer(f, lineterminator="\n")
+        if write_header:
+            writer.writerow(OUTPUT_COLUMNS)
+
+        for path, pages in pool.map(extract_pages, build_tasks(pdfs)):
+            context = state.setdefault(path, {"day": None, "category": None})
+            for events in pages:
+                for event in events:
+                    if event[0] == "row":
+                        writer.writerow([context["day"], context["category"], *event[1:]])
+                        rows_per_pdf[path] += 1
+                    else:
+                        context[event[0]] = event[1]
+            f.flush()
+
+    for path, digest in hashes.items():
+        manifest[digest] = {"file": Path(path).name, "rows": rows_per_pdf[path]}
+    write_manifest(manifest)
+
+    total = sum(rows_per_pdf.values())
+    print(f"Extracted {total} rows from {len(pdfs)} PDF(s)")
+    return total
+
+# Run Extraction
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract Bantay Presyo price tables from PDFs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of extraction processes")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="forget past extractions and start a fresh extracted_prices.csv")
+    args = parser.parse_args()
+
+    extract(args.workers, args.rebuild)
@@ -0,0 +1,134 @@
+from pathlib import Path
+import json
+import pandas as pd
+
+# Paths
+CACHE_FILE = Path("data/processed/dim_key_cache.json")
+
+# Every database gets a random instance id on first use; dropping and
+# recreating the schema gives a new one, so cached ids are never reused
+# against a reset database
+INSTANCE_DDL = """
+CREATE TABLE IF NOT EXISTS etl_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+INSERT INTO etl_meta (key, value)
+VALUES ('instance_id', {uuid})
+ON CONFLICT (key) DO NOTHING;
+"""
+UUID_SQL = {"postgres": "gen_random_uuid()::text", "duckdb": "uuid()::text"}
+
+# Row counts and max ids catch truncates and inserts from other loaders; the
+# checksums catch attribute UPDATEs (e.g. the trainer rewriting a
+# specification). The dimensions are small, and a load that writes no
+# dimension rows hashes them only once.
+FINGERPRINT_SQL = """
+SELECT (SELECT value FROM etl_meta WHERE key = 'instance_id'),
+       (SELECT count(*) FROM dim_item), (SELECT coalesce(max(item_id), 0) FROM dim_item),
+       (SELECT count(*) FROM dim_date), (SELECT coalesce(max(date_id), 0) FROM dim_date),
+       (SELECT coalesce(md5(string_agg(
+            item_id::text || '|' || item_name || '|' || coalesce(category, '') || '|'
+            || coalesce(specification, ''), ',' ORDER BY item_id)), '') FROM dim_item),
+       (SELECT coalesce(md5(string_agg(
+            date_id::text || '|' || date::text || '|' || coalesce(week_num::text, ''),
+            ',' ORDER BY date_id)), '') FROM dim_date)
+"""
+
+def item_attrs(category, specification):
+    return f"{'' if pd.isna(category) else category}\x1f{'' if pd.isna(specification) else specification}"
+
+def date_key(date):
+    return pd.Timestamp(date).strftime("%Y-%m-%d")
+
+class KeyCache:
+    """
+    On-disk map of dimension natural keys to surrogate ids, one section per
+    database instance. Items also keep their category/spec so changed
+    attributes are still upserted. validate() drops a section whose
+    fingerprint no longer matches the database.
+    """
+
+    def __init__(self, backend="postgres", path=CACHE_FILE):
+        self.backend = backend
+        self.path = Path(path)
+        self.sections = {}
+        self.section = None
+        self.instance = None
+        if self.path.exists():
+            try:
+                self.sections = json.loads(self.path.read_text(encoding="utf-8"))
+            except ValueError:
+                self.sections = {}
+
+    def fingerprint(self, cur):
+        cur.execute(FINGERPRINT_SQL)
+        return [str(v) for v in cur.fetchone()]
+
+    def validate(self, cur):
+        """Attach to the current database's section; returns False if it was reset"""
+        cur.execute(INSTANCE_DDL.format(uuid=UUID_SQL[self.backend]))
+        fingerprint = self.fingerprint(cur)
+        self.instance = fingerprint[0]
+        section = self.sections.get(self.instance)
+        valid = section is not None and section.get("fingerprint") == fingerprint
+        if not valid:
+            section = self.sections[self.instance] = {"fingerprint": fingerprint, "items": {}, "dates": {}}
+        self.section = section
+        return valid
+
+    # Lookups
+    def uncached_items(self, items):
+        """Rows of an item frame whose name is unknown or whose attributes changed"""
+        cached = self.section["items"]
+        attrs = [item_attrs(c, s) for c, s in zip(items["category"], items["specification"])]
+        keep = [cached.get(name, (None, None))[1] != a for name, a in zip(items["item_name"], attrs)]
+        return items[keep]
+
+    def uncached_dates(self, dates):
+        cached = self.section["dates"]
+        keep = [
+            cached.get(date_key(d), (None, None))[1] != int(w)
+            for d, w in zip(dates["date"], dates["week_num"])
+        ]
+        return dates[keep]
+
+    def item_ids(self, names):
+        return {n: self.section["items"][n][0] for n in names if n in self.section["items"]}
+
+    def date_ids(self, dates):
+        cached = self.section["dates"]
+        return {d: cached[date_key(d)][0] for d in dates if date_key(d) in cached}
+
+    # Updates
+    def learn_items(self, cur, names):
+        """Fetch and remember the ids and attributes of these items"""
+        if not len(names):
+            return
+        cur.execute(
+            "SELECT item_name, item_id, category, specification FROM dim_item WHERE item_name = ANY(%s)",
+            (list(names),),
+        )
+        for name, item_id, category, spec in cur.fetchall():
+            self.section["items"][name] = [int(item_id), item_attrs(category, spec)]
+
+    def learn_dates(self, cur, dates):
+        if not len(dates):
+            return
+        days = [pd.Timestamp(d).date() for d in dates]
+        cur.execute("SELECT date, date_id, week_num FROM dim_date WHERE date = ANY(%s)", (days,))
+        for date, date_id, week_num in cur.fetchall():
+            self.section["dates"][date_key(date)] = [int(date_id), None if week_num is None else int(week_num)]
+
+    def refresh_fingerprint(self, cur, changed=True):
+        """
+        Record the fingerprint after this load's writes, before commit.
+        A load that wrote no dimension rows keeps the one validate() read.
+        """
+        if changed:
+            self.section["fingerprint"] = self.fingerprint(cur)
+
+    def save(self):
+        """Write the cache; only call once the load has committed"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self.sections, ensure_ascii=False, indent=2), encoding="utf-8")
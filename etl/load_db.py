@@ -1,23 +1,38 @@
+import argparse
+import io
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+import numpy as np
 import pandas as pd
-from psycopg2.extras import execute_values
-from etl.db import get_connection
+from psycopg2 import sql
 
-# LOAD CSV 
-CSV_FILE = "data/processed/cleaned_prices.csv"
-df = pd.read_csv(CSV_FILE)
+# Add project root to sys.path so 'etl' can be imported
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT_DIR))
 
-# Ensure 'date' is datetime and compute week number
-df["date"] = pd.to_datetime(df["date"])
-df["week_num"] = df["date"].dt.isocalendar().week
+from etl.db import DB_BACKEND, execute_values, init_pool, pool_stats, transaction
+from etl.key_cache import KeyCache
+from etl.storage import read_dataset
 
-# Ensure 'specification' is string (replace NaN with empty string)
-df["specification"] = df["specification"].fillna("")
+MANIFEST_FILE = Path("data/processed/load_manifest.json")
+MANIFEST_KEEP = 50
+
+# PREPARE
+def prepare(df):
+    """Add the ISO week number used by dim_date"""
+    df = df.copy()
+    df["week_num"] = df["date"].dt.isocalendar().week
+    return df
 
 # UPSERT dim_item 
-def upsert_items(df):
+def upsert_items(df, cache=None):
     """
     Insert or update items into dim_item
-    Uses item_name as unique key
+    Uses item_name as unique key; with a KeyCache, items already cached
+    with the same attributes are skipped. Returns the number of items sent.
     """
     items = (
         df.groupby("item_name", as_index=False)
@@ -25,107 +40,596 @@ def upsert_items(df):
             "category": "first",
             "specification": lambda x: ", ".join(filter(None, x.unique()))
         })
-        .to_dict(orient="records")
-    )
-
-    conn = get_connection()
-    cur = conn.cursor()
-
-    execute_values(
-        cur,
-        """
-        INSERT INTO dim_item (item_name, category, specification)
-        VALUES %s
-        ON CONFLICT (item_name) DO UPDATE
-        SET category = EXCLUDED.category,
-            specification = EXCLUDED.specification
-        """,
-        [(i["item_name"], i["category"], i["specification"]) for i in items]
     )
+    if cache is not None:
+        items = cache.uncached_items(items)
+    items = items.to_dict(orient="records")
+    if not items:
+        return 0
 
-    conn.commit()
-    cur.close()
-    conn.close()
+    with transaction() as conn, conn.cursor() as cur:
+        execute_values(
+            cur,
+            """
+            INSERT INTO dim_item (item_name, category, specification)
+            VALUES %s
+            ON CONFLICT (item_name) DO UPDATE
+            SET category = EXCLUDED.category,
+                specification = EXCLUDED.specification
+            """,
+            [(i["item_name"], i["category"], i["specification"]) for i in items]
+        )
+        if cache is not None:
+            cache.learn_items(cur, [i["item_name"] for i in items])
+    return len(items)
 
 # UPSERT dim_date 
-def upsert_dates(df):
+def upsert_dates(df, cache=None):
     """
     Insert or update dates into dim_date
-    Uses date as unique key
-    """
-    dates = df[["date", "week_num"]].drop_duplicates().to_dict(orient="records")
-    conn = get_connection()
-    cur = conn.cursor()
-
-    execute_values(
-        cur,
-        """
-        INSERT INTO dim_date (date, week_num)
-        VALUES %s
-        ON CONFLICT (date) DO UPDATE
-        SET week_num = EXCLUDED.week_num
-        """,
-        [(d["date"], d["week_num"]) for d in dates]
+    Uses date as unique key; cached dates are skipped.
+    Returns the number of dates sent.
+    """
+    dates = df[["date", "week_num"]].drop_duplicates()
+    if cache is not None:
+        dates = cache.uncached_dates(dates)
+    dates = dates.to_dict(orient="records")
+    if not dates:
+        return 0
+
+    with transaction() as conn, conn.cursor() as cur:
+        execute_values(
+            cur,
+            """
+            INSERT INTO dim_date (date, week_num)
+            VALUES %s
+            ON CONFLICT (date) DO UPDATE
+            SET week_num = EXCLUDED.week_num
+            """,
+            [(d["date"], d["week_num"]) for d in dates]
+        )
+        if cache is not None:
+            cache.learn_dates(cur, [d["date"] for d in dates])
+    return len(dates)
+
+# RESOLVE surrogate keys
+def resolve_keys(cur, df, price_col="price", cache=None):
+    """
+    Map (item_name, date, price) rows to (item_id, date_id, price_date,
+    price) tuples with a vectorized join against the dimension keys. Only
+    the names and dates present in df, and not in the KeyCache if one is
+    given, are fetched. Rows with a missing key or a non-numeric/negative
+    price are dropped; the first row wins for a repeated (item_id, date_id).
+    """
+    frame = pd.DataFrame({
+        "item_name": df["item_name"].values,
+        "date": pd.to_datetime(df["date"]).dt.normalize().values,
+        "price": pd.to_numeric(df[price_col], errors="coerce").round(2).values,
+    })
+    frame = frame[frame["price"] >= 0]
+
+    names = frame["item_name"].unique().tolist()
+    days = frame["date"].dt.date.unique().tolist()
+    item_ids = cache.item_ids(names) if cache is not None else {}
+    date_ids = cache.date_ids(days) if cache is not None else {}
+
+    names = [n for n in names if n not in item_ids]
+    days = [d for d in days if d not in date_ids]
+    if names:
+        cur.execute("SELECT item_id, item_name FROM dim_item WHERE item_name = ANY(%s)", (names,))
+        item_ids.update({name: iid for iid, name in cur.fetchall()})
+    if days:
+        cur.execute("SELECT date_id, date FROM dim_date WHERE date = ANY(%s)", (days,))
+        date_ids.update({date: did for did, date in cur.fetchall()})
+
+    items = pd.DataFrame({"item_id": list(item_ids.values()), "item_name": list(item_ids)})
+    dates = pd.DataFrame({"date_id": list(date_ids.values()), "date": pd.to_datetime(list(date_ids))})
+
+    keyed = (
+        frame.merge(items, on="item_name", how="inner")
+             .merge(dates, on="date", how="inner")
+             .drop_duplicates(["item_id", "date_id"], keep="first")
     )
+    # Plain Python ints/floats for psycopg2
+    return list(zip(
+        keyed["item_id"].tolist(),
+        keyed["date_id"].tolist(),
+        keyed["date"].dt.date.tolist(),
+        keyed["price"].tolist(),
+    ))
 
-    conn.commit()
-    cur.close()
-    conn.close()
+# PARTITIONS
+# fact_prices is range-partitioned by price_date, one partition per year
+PARTITION_DDL = """
+CREATE TABLE IF NOT EXISTS {table} PARTITION OF fact_prices
+    FOR VALUES FROM (%s) TO (%s)
+"""
+
+def ensure_partitions(cur, dates):
+    """Create the yearly fact_prices partitions a batch of dates needs"""
+    if DB_BACKEND == "duckdb":
+        return []  # single table in the embedded backend
+    years = sorted({d.year for d in pd.to_datetime(pd.Series(dates)).dropna()})
+    if not years:
+        return []
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'fact_prices'::regclass
+    """)
+    existing = {name for (name,) in cur.fetchall()}
+    created = []
+    for year in years:
+        table = f"fact_prices_{year}"
+        if table in existing:
+            continue
+        cur.execute(
+            sql.SQL(PARTITION_DDL).format(table=sql.Identifier(table)),
+            (f"{year}-01-01", f"{year + 1}-01-01"),
+        )
+        created.append(table)
+    return created
 
 # UPSERT fact_prices 
-def upsert_prices(df):
+def upsert_prices(df, cache=None, delta=True):
     """
     Insert or update prices into fact_prices
-    Links to dim_item and dim_date
-    """
-    conn = get_connection()
-    cur = conn.cursor()
-
-    # Fetch mappings from dimension tables
-    cur.execute("SELECT item_id, item_name FROM dim_item")
-    item_map = {name: iid for iid, name in cur.fetchall()}
-
-    cur.execute("SELECT date_id, date FROM dim_date")
-    date_map = {date: did for did, date in cur.fetchall()}
-
-    # Prepare fact table values and remove duplicates
-    price_values = []
-    seen_pairs = set()
-    for _, row in df.iterrows():
-        iid = item_map.get(row["item_name"])
-        did = date_map.get(row["date"].date())
-        if iid and did:
-            key = (iid, did)
-            if key not in seen_pairs:
-                # Ensure price is numeric and >=0
-                try:
-                    price = round(float(row["price"]), 2)
-                    if price < 0:
-                        continue
-                except:
-                    continue
-                price_values.append((iid, did, price))
-                seen_pairs.add(key)
-
-    if price_values:
+    Links to dim_item and dim_date; with delta, rows already stored with
+    the same price are not sent. Returns (inserted, updated, skipped).
+    """
+    with transaction() as conn, conn.cursor() as cur:
+        price_values = resolve_keys(cur, df, cache=cache)
+        if not price_values:
+            return 0, 0, 0
+
+        frame = pd.DataFrame(price_values, columns=["item_id", "date_id", "price_date", "price"])
+        ids = frame["item_id"].unique().tolist()
+        days = frame["price_date"].unique().tolist()
+        current = fetch_frame(cur, CURRENT_FACTS, (ids, days, min(days), max(days)),
+                              ["item_id", "price_date", "price"])
+        current = current.astype({"item_id": "int64", "price": float})
+        send, inserted, updated, skipped = changed_rows(frame, current, ["item_id", "price_date"])
+        if not delta:
+            send = frame
+        if send.empty:
+            return inserted, updated, skipped
+
+        price_values = list(send.itertuples(index=False, name=None))
+        ensure_partitions(cur, send["price_date"].tolist())
         execute_values(
             cur,
             """
-            INSERT INTO fact_prices (item_id, date_id, price)
+            INSERT INTO fact_prices (item_id, date_id, price_date, price)
             VALUES %s
-            ON CONFLICT (item_id, date_id) DO UPDATE
-            SET price = EXCLUDED.price
+            ON CONFLICT (item_id, price_date) DO UPDATE
+            SET price = EXCLUDED.price,
+                is_forecast = false
+            WHERE (fact_prices.price, fact_prices.is_forecast) IS DISTINCT FROM (EXCLUDED.price, false)
             """,
             price_values
         )
+        mark_touched(cur, [(v[0], v[2]) for v in price_values])
+        refresh_summaries(cur)
+    return inserted, updated, skipped
+
+# SUMMARY tables
+# Groups touched by a load are collected in touched_prices, then only those
+# groups are recomputed from the observed facts
+TOUCHED_DDL = """
+CREATE TEMP TABLE IF NOT EXISTS touched_prices (
+    item_id INT,
+    price_date DATE
+) ON COMMIT DROP
+"""
+
+TOUCHED_FROM_STAGE = """
+INSERT INTO touched_prices (item_id, price_date)
+SELECT DISTINCT i.item_id, s.date
+FROM stage_price s
+JOIN dim_item i ON i.item_name = s.item_name
+"""
+
+TOUCHED_ALL = """
+INSERT INTO touched_prices (item_id, price_date)
+SELECT DISTINCT item_id, price_date FROM fact_prices
+WHERE NOT is_forecast
+"""
+
+REFRESH_LATEST = """
+INSERT INTO item_latest_price (item_id, price_date, price)
+SELECT DISTINCT ON (f.item_id) f.item_id, f.price_date, f.price
+FROM fact_prices f
+WHERE f.item_id IN (SELECT item_id FROM touched_prices)
+  AND NOT f.is_forecast
+ORDER BY f.item_id, f.price_date DESC
+ON CONFLICT (item_id) DO UPDATE
+SET price_date = EXCLUDED.price_date,
+    price = EXCLUDED.price
+WHERE (item_latest_price.price_date, item_latest_price.price)
+      IS DISTINCT FROM (EXCLUDED.price_date, EXCLUDED.price)
+"""
+
+REFRESH_WEEKLY = """
+WITH weeks AS (
+    SELECT DISTINCT item_id, date_trunc('week', price_date)::date AS week_start
+    FROM touched_prices
+)
+INSERT INTO item_weekly_prices (item_id, week_start, min_price, avg_price, max_price, n_prices)
+SELECT w.item_id, w.week_start, min(f.price), round(avg(f.price), 2), max(f.price), count(*)
+FROM weeks w
+JOIN fact_prices f
+  ON f.item_id = w.item_id
+ AND f.price_date >= w.week_start
+ AND f.price_date < w.week_start + 7
+WHERE NOT f.is_forecast
+GROUP BY w.item_id, w.week_start
+ON CONFLICT (item_id, week_start) DO UPDATE
+SET min_price = EXCLUDED.min_price,
+    avg_price = EXCLUDED.avg_price,
+    max_price = EXCLUDED.max_price,
+    n_prices = EXCLUDED.n_prices
+"""
+
+REFRESH_DECEMBER = """
+WITH years AS (
+    SELECT DISTINCT item_id, EXTRACT(YEAR FROM price_date)::int AS year
+    FROM touched_prices
+    WHERE EXTRACT(MONTH FROM price_date) = 12
+)
+INSERT INTO item_december_prices (item_id, year, avg_price, total_price, n_prices)
+SELECT y.item_id, y.year, avg(f.price), sum(f.price), count(*)
+FROM years y
+JOIN fact_prices f
+  ON f.item_id = y.item_id
+ AND f.price_date >= make_date(y.year, 12, 1)
+ AND f.price_date < make_date(y.year + 1, 1, 1)
+WHERE NOT f.is_forecast
+GROUP BY y.item_id, y.year
+ON CONFLICT (item_id, year) DO UPDATE
+SET avg_price = EXCLUDED.avg_price,
+    total_price = EXCLUDED.total_price,
+    n_prices = EXCLUDED.n_prices
+"""
+
+# The embedded DuckDB backend defines the summaries as views instead
+SUMMARY_VIEWS = DB_BACKEND == "duckdb"
+
+def mark_touched(cur, pairs):
+    """Record (item_id, price_date) pairs whose summaries need refreshing"""
+    if SUMMARY_VIEWS:
+        return
+    cur.execute(TOUCHED_DDL)
+    execute_values(cur, "INSERT INTO touched_prices (item_id, price_date) VALUES %s", pairs)
+
+def mark_touched_from_stage(cur):
+    """Record the groups of every row staged in stage_price"""
+    if SUMMARY_VIEWS:
+        return
+    cur.execute(TOUCHED_DDL)
+    cur.execute(TOUCHED_FROM_STAGE)
+
+def refresh_summaries(cur, rebuild=False):
+    """
+    Recompute the summary groups recorded in touched_prices (or every
+    group with rebuild). Returns the number of rows written per table.
+    """
+    if SUMMARY_VIEWS:
+        return {}
+    cur.execute(TOUCHED_DDL)
+    if rebuild:
+        cur.execute(TOUCHED_ALL)
+    counts = {}
+    for table, query in [
+        ("item_latest_price", REFRESH_LATEST),
+        ("item_weekly_prices", REFRESH_WEEKLY),
+        ("item_december_prices", REFRESH_DECEMBER),
+    ]:
+        cur.execute(query)
+        counts[table] = cur.rowcount
+    cur.execute("TRUNCATE touched_prices")
+    return counts
 
-    conn.commit()
-    cur.close()
-    conn.close()
+# BULK LOAD (COPY)
+# Rows are streamed into temp staging tables with COPY, then merged into
+# the star schema with set-based upserts, all in one transaction.
+STAGING_DDL = """
+CREATE TEMP TABLE stage_item (
+    item_name TEXT,
+    category TEXT,
+    specification TEXT
+) ON COMMIT DROP;
+CREATE TEMP TABLE stage_date (
+    date DATE,
+    week_num INT
+) ON COMMIT DROP;
+CREATE TEMP TABLE stage_price (
+    ord BIGINT,
+    item_name TEXT,
+    date DATE,
+    price NUMERIC(10,2)
+) ON COMMIT DROP;
+"""
+
+MERGE_ITEMS = """
+INSERT INTO dim_item (item_name, category, specification)
+SELECT item_name, category, specification FROM stage_item
+ON CONFLICT (item_name) DO UPDATE
+SET category = EXCLUDED.category,
+    specification = EXCLUDED.specification
+WHERE (dim_item.category, dim_item.specification)
+      IS DISTINCT FROM (EXCLUDED.category, EXCLUDED.specification)
+"""
+
+MERGE_DATES = """
+INSERT INTO dim_date (date, week_num)
+SELECT date, week_num FROM stage_date
+ON CONFLICT (date) DO UPDATE
+SET week_num = EXCLUDED.week_num
+WHERE dim_date.week_num IS DISTINCT FROM EXCLUDED.week_num
+"""
+
+# First row wins for a repeated (item, date), as in upsert_prices
+MERGE_PRICES = """
+INSERT INTO fact_prices (item_id, date_id, price_date, price)
+SELECT DISTINCT ON (i.item_id, d.date_id) i.item_id, d.date_id, s.date, s.price
+FROM stage_price s
+JOIN dim_item i ON i.item_name = s.item_name
+JOIN dim_date d ON d.date = s.date
+ORDER BY i.item_id, d.date_id, s.ord
+ON CONFLICT (item_id, price_date) DO UPDATE
+SET price = EXCLUDED.price,
+    is_forecast = false
+WHERE (fact_prices.price, fact_prices.is_forecast) IS DISTINCT FROM (EXCLUDED.price, false)
+"""
+
+# Current values for the keys in a batch, to diff against before staging
+CURRENT_ITEMS = """
+SELECT item_name, category, specification FROM dim_item
+WHERE item_name = ANY(%s)
+"""
+
+CURRENT_DATES = """
+SELECT date, week_num FROM dim_date
+WHERE date = ANY(%s)
+"""
+
+CURRENT_PRICES = """
+SELECT i.item_name, f.price_date, f.price
+FROM fact_prices f
+JOIN dim_item i ON i.item_id = f.item_id
+WHERE i.item_name = ANY(%s)
+  AND f.price_date = ANY(%s)
+  AND f.price_date BETWEEN %s AND %s
+  AND NOT f.is_forecast
+"""
+
+# Same, keyed by surrogate ids (row-insert path)
+CURRENT_FACTS = """
+SELECT item_id, price_date, price
+FROM fact_prices
+WHERE item_id = ANY(%s)
+  AND price_date = ANY(%s)
+  AND price_date BETWEEN %s AND %s
+  AND NOT is_forecast
+"""
+
+def copy_frame(cur, frame, table, not_null=()):
+    """COPY a frame into a table from an in-memory CSV buffer"""
+    if DB_BACKEND == "duckdb":
+        return cur.insert_frame(table, frame)
+    buf = io.StringIO()
+    frame.to_csv(buf, index=False, header=False, date_format="%Y-%m-%d")
+    buf.seek(0)
+    options = "FORMAT csv"
+    if not_null:
+        # Unquoted empty fields are NULL in CSV COPY; keep these as ''
+        options += f", FORCE_NOT_NULL ({', '.join(not_null)})"
+    cur.copy_expert(f"COPY {table} ({', '.join(frame.columns)}) FROM STDIN WITH ({options})", buf)
+    return len(frame)
+
+def staging_frames(df):
+    """Build the item, date and price frames to stage from a prepared frame"""
+    items = (
+        df.groupby("item_name", as_index=False)
+        .agg({
+            "category": "first",
+            "specification": lambda x: ", ".join(filter(None, x.unique()))
+        })
+    )
+    dates = df[["date", "week_num"]].drop_duplicates("date")
+
+    # Same validation as upsert_prices: numeric, non-negative, 2 decimals
+    prices = df[["item_name", "date"]].copy()
+    prices["price"] = pd.to_numeric(df["price"], errors="coerce").round(2)
+    prices.insert(0, "ord", range(len(prices)))
+    prices = prices[prices["price"] >= 0]
+    prices = prices.drop_duplicates(["item_name", "date"], keep="first")
+    return items, dates, prices
+
+# DELTA
+def fetch_frame(cur, query, params, columns):
+    cur.execute(query, params)
+    frame = pd.DataFrame(cur.fetchall(), columns=columns)
+    if "date" in frame:
+        frame["date"] = pd.to_datetime(frame["date"]).astype("datetime64[ns]")
+    return frame
+
+def changed_rows(frame, current, keys):
+    """
+    Split a staged frame against the current DB rows with the same keys.
+    Returns (rows to send, n_new, n_changed, n_unchanged).
+    """
+    values = [c for c in current.columns if c not in keys]
+    merged = frame.merge(current, on=keys, how="left", suffixes=("", "_db"), indicator=True)
+    new = (merged["_merge"] == "left_only").values
+    differs = np.zeros(len(merged), dtype=bool)
+    for col in values:
+        ours, theirs = merged[col], merged[f"{col}_db"]
+        if ours.dtype == object or theirs.dtype == object:
+            ours, theirs = ours.fillna("").astype(str), theirs.fillna("").astype(str)
+        # Nullable dtypes compare to NA on new rows
+        differs |= (ours != theirs).fillna(True).to_numpy(dtype=bool)
+    changed = ~new & differs
+    send = merged.loc[new | changed, list(frame.columns)]
+    return send, int(new.sum()), int(changed.sum()), int((~new & ~changed).sum())
+
+def delta_frames(cur, items, dates, prices):
+    """Drop staged rows whose item, date or price is already in the DB unchanged"""
+    names = items["item_name"].tolist()
+    days = dates["date"].dt.date.tolist()
+
+    current = fetch_frame(cur, CURRENT_ITEMS, (names,), ["item_name", "category", "specification"])
+    items, *item_counts = changed_rows(items, current, ["item_name"])
+
+    current = fetch_frame(cur, CURRENT_DATES, (days,), ["date", "week_num"])
+    current["week_num"] = current["week_num"].astype("Int64")
+    dates, *date_counts = changed_rows(dates.astype({"week_num": "Int64"}), current, ["date"])
+
+    # The explicit range lets the planner prune fact_prices partitions
+    names = prices["item_name"].unique().tolist()
+    days = prices["date"].dt.date.unique().tolist()
+    current = fetch_frame(cur, CURRENT_PRICES, (names, days, min(days, default=None), max(days, default=None)),
+                          ["item_name", "date", "price"])
+    current["price"] = current["price"].astype(float)
+    prices, *price_counts = changed_rows(prices, current, ["item_name", "date"])
+
+    counts = {"items": item_counts, "dates": date_counts, "prices": price_counts}
+    return items, dates, prices, counts
+
+def write_manifest(stats):
+    """Append one load's counts to the load manifest (last MANIFEST_KEEP loads)"""
+    loads = []
+    if MANIFEST_FILE.exists():
+        try:
+            loads = json.loads(MANIFEST_FILE.read_text())["loads"]
+        except (ValueError, KeyError):
+            loads = []
+    loads.append({"loaded_at": datetime.now().isoformat(timespec="seconds"), **stats})
+    MANIFEST_FILE.parent.mkdir(parents=True, exist_ok=True)
+    MANIFEST_FILE.write_text(json.dumps({"loads": loads[-MANIFEST_KEEP:]}, indent=2))
+
+def bulk_load(df, delta=True):
+    """
+    Load a cleaned price frame with COPY + set-based upserts in a single
+    transaction. With delta, rows already in the DB with the same values
+    are not sent at all, so repeat loads of unchanged history write
+    nothing. Returns inserted/updated/skipped counts and timings.
+    """
+    start = time.perf_counter()
+    items, dates, prices = staging_frames(prepare(df))
+    staged_rows = len(prices)
+    counts = None
+    cache = KeyCache(DB_BACKEND)
+
+    with transaction() as conn, conn.cursor() as cur:
+        # Dimension rows already cached with the same values need no work
+        cache.validate(cur)
+        n_dims = len(items), len(dates)
+        items, dates = cache.uncached_items(items), cache.uncached_dates(dates)
+        cached = {"items": n_dims[0] - len(items), "dates": n_dims[1] - len(dates)}
+        learn_items, learn_dates = items["item_name"].tolist(), dates["date"].tolist()
+
+        if delta:
+            items, dates, prices, counts = delta_frames(cur, items, dates, prices)
+        diffed = time.perf_counter()
+
+        n_items = n_dates = n_prices = 0
+        summaries = {}
+        if len(items) or len(dates) or len(prices):
+            cur.execute(STAGING_DDL)
+            copy_frame(cur, items, "stage_item", not_null=["specification"])
+            copy_frame(cur, dates, "stage_date")
+            copy_frame(cur, prices, "stage_price")
+
+            cur.execute(MERGE_ITEMS)
+            n_items = cur.rowcount
+            cur.execute(MERGE_DATES)
+            n_dates = cur.rowcount
+            ensure_partitions(cur, prices["date"])
+            cur.execute(MERGE_PRICES)
+            n_prices = cur.rowcount
+            mark_touched_from_stage(cur)
+            summaries = refresh_summaries(cur)
+
+        cache.learn_items(cur, learn_items)
+        cache.learn_dates(cur, learn_dates)
+        cache.refresh_fingerprint(cur, changed=bool(n_items or n_dates))
+    cache.save()
+
+    seconds = time.perf_counter() - start
+    stats = {
+        "mode": "delta" if delta else "full",
+        "rows": len(df),
+        "items": n_items,
+        "dates": n_dates,
+        "prices": n_prices,
+        "summaries": summaries,
+        "cached": cached,
+        "diff_seconds": round(diffed - start, 3),
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(len(df) / seconds) if seconds else None,
+    }
+    if counts:
+        inserted, updated, skipped = counts["prices"]
+        stats.update(inserted=inserted, updated=updated, skipped=skipped)
+        stats["dims"] = {
+            name: dict(zip(["inserted", "updated", "skipped"], counts[name]))
+            for name in ["items", "dates"]
+        }
+    else:
+        stats.update(inserted=None, updated=None, skipped=staged_rows - n_prices)
+    return stats
+
+# LOAD
+def load(df, method="copy", delta=True):
+    """
+    Upsert a cleaned price frame into the star schema in one transaction
+    and record the counts in the load manifest
+    """
+    if method == "copy":
+        stats = bulk_load(df, delta)
+    else:
+        start = time.perf_counter()
+        df = prepare(df)
+        cache = KeyCache(DB_BACKEND)
+        with transaction() as conn, conn.cursor() as cur:
+            cache.validate(cur)
+            n_dims = upsert_items(df, cache) + upsert_dates(df, cache)
+            inserted, updated, skipped = upsert_prices(df, cache, delta)
+            cache.refresh_fingerprint(cur, changed=n_dims > 0)
+        cache.save()
+        stats = {"mode": "insert", "rows": len(df), "seconds": round(time.perf_counter() - start, 3),
+                 "inserted": inserted, "updated": updated, "skipped": skipped}
+    write_manifest(stats)
+    return stats
 
 # RUN ETL
 if __name__ == "__main__":
-    upsert_items(df)
-    upsert_dates(df)
-    upsert_prices(df)
-    print("Database successfully updated from cleaned_prices.csv")
+    parser = argparse.ArgumentParser(description="Load cleaned prices into Postgres")
+    parser.add_argument("--method", choices=["copy", "insert"], default="copy",
+                        help="COPY into staging tables (default) or row INSERTs")
+    parser.add_argument("--full", action="store_true",
+                        help="stage every row instead of only new or changed ones")
+    parser.add_argument("--rebuild-summaries", action="store_true",
+                        help="recompute every summary table group instead of loading")
+    parser.add_argument("--dsn", default=None,
+                        help="connect to this database instead of the configured one")
+    args = parser.parse_args()
+
+    if args.dsn:
+        init_pool(args.dsn)
+    if args.rebuild_summaries:
+        with transaction() as conn, conn.cursor() as cur:
+            print(f"Summary rows written: {refresh_summaries(cur, rebuild=True)}")
+        raise SystemExit
+
+    # typed: datetime dates, empty-string specs
+    stats = load(read_dataset("cleaned_prices"), args.method, delta=not args.full)
+    print("Database successfully updated from cleaned_prices")
+    if "rows_per_sec" in stats:
+        print(f"{stats['rows']} rows in {stats['seconds']}s ({stats['rows_per_sec']} rows/s), "
+              f"{stats['items']} items, {stats['dates']} dates, {stats['prices']} prices merged")
+    if stats.get("inserted") is not None:
+        print(f"Prices: {stats['inserted']} inserted, {stats['updated']} updated, {stats['skipped']} unchanged")
+    if pool_stats():
+        print(f"Connection pool: {pool_stats()}")
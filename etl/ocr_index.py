@@ -0,0 +1,117 @@
+from collections import Counter, defaultdict
+from itertools import islice
+from pathlib import Path
+import hashlib
+import json
+import re
+
+# Paths
+CACHE_FILE = Path("data/processed/ocr_cache.json")
+
+NGRAM = 3
+MAX_CANDIDATES = 3
+MIN_CONFIDENCE = 0.75
+
+def ngrams(text, n=NGRAM):
+    padded = f"  {text.lower()} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+def edit_distance(a, b):
+    """Levenshtein distance with two rolling rows"""
+    if len(a) < len(b):
+        a, b = b, a
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+DIGITS_RE = re.compile(r"\d+")
+
+def digits(text):
+    """Number sequences in a string; sizes and grades differ only here"""
+    return DIGITS_RE.findall(text)
+
+def similarity(a, b):
+    if not a and not b:
+        return 1.0
+    return 1 - edit_distance(a.lower(), b.lower()) / max(len(a), len(b))
+
+class OcrIndex:
+    """
+    Character trigram index over known surface forms (OCR misreadings and
+    canonical names), each pointing at its canonical name.
+    Candidates sharing the most trigrams are re-ranked by edit distance.
+    A form with numbers only matches text with the same numbers, so
+    "19–21 pcs/kg" is not snapped to "10–12 pcs/kg"; a form without any
+    still matches a stray digit (OCR reading "l" as "1").
+    """
+
+    def __init__(self, mapping):
+        forms = {}
+        for noisy, canonical in mapping.items():
+            forms[noisy] = canonical
+            forms.setdefault(canonical, canonical)
+        self.forms = list(forms.items())
+        self.digits = [digits(form) for form, _ in self.forms]
+        self.postings = defaultdict(list)
+        for idx, (form, _) in enumerate(self.forms):
+            for gram in ngrams(form):
+                self.postings[gram].append(idx)
+        self.fingerprint = hashlib.sha1(
+            json.dumps(sorted(self.forms), ensure_ascii=False).encode()
+        ).hexdigest()[:12]
+
+    def lookup(self, text):
+        """Return (canonical, confidence) of the nearest known form, or (None, 0.0)"""
+        hits = Counter()
+        for gram in ngrams(text):
+            hits.update(self.postings.get(gram, ()))
+        best, best_score = None, 0.0
+        numbers = digits(text)
+        candidates = (idx for idx, _ in hits.most_common() if self.digits[idx] in (numbers, []))
+        for idx in islice(candidates, MAX_CANDIDATES):
+            form, canonical = self.forms[idx]
+            score = similarity(text, form)
+            if score > best_score:
+                best, best_score = canonical, score
+        return best, round(best_score, 3)
+
+class ResolutionCache:
+    """On-disk cache of past lookups, one section per index"""
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = Path(path)
+        self.sections = None  # read on first lookup
+        self.dirty = False
+
+    def load(self):
+        if self.sections is None:
+            self.sections = {}
+            if self.path.exists():
+                try:
+                    self.sections = json.loads(self.path.read_text(encoding="utf-8"))
+                except ValueError:
+                    pass
+        return self.sections
+
+    def resolve(self, name, index, text):
+        section = self.load().get(name)
+        if section is None or section.get("fingerprint") != index.fingerprint:
+            # Vocabulary changed, past resolutions may be stale
+            section = self.sections[name] = {"fingerprint": index.fingerprint, "resolved": {}}
+        resolved = section["resolved"]
+        if text not in resolved:
+            resolved[text] = list(index.lookup(text))
+            self.dirty = True
+        canonical, confidence = resolved[text]
+        return canonical, confidence
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self.sections, ensure_ascii=False, indent=2), encoding="utf-8")
+        self.dirty = False
@@ -0,0 +1,145 @@
+from math import log, sqrt
+from pathlib import Path
+import json
+
+# Paths
+STATE_FILE = Path("data/processed/price_stats.json")
+STATE_VERSION = 2
+
+# Candidate OCR decimal errors: a dropped decimal point multiplies the
+# price by 10 or 100, so the fix is one of these scales
+SCALES = {0.1: "price_div10", 0.01: "price_div100"}
+Z_THRESHOLD = 4.0  # log-price deviations (in sigmas) treated as suspect
+MIN_WEIGHT = 0.1  # exponential forgetting once an item has ~10 prices
+PRIOR_WEIGHT = 2  # pseudo-observations of the prior spread below
+ITEM_PRIOR_SIGMA = 0.2  # one item's prices rarely move more than ~20%
+ITEM_MIN_SIGMA = 0.05
+# Items within a category differ far more (eggs vs chicken), so a category
+# is only evidence of a gross outlier, never of which decimal was dropped
+CATEGORY_MIN_ITEMS = 3
+CATEGORY_MIN_SIGMA = 0.8
+
+# The old fixed ceilings decide whether a first-seen item's price lost its
+# decimal point; an item's own history decides after that
+LEGACY_CEILING = 2000
+LEGACY_FIX_CATEGORIES = {"LOWLAND VEGETABLES", "FRUITS", "SPICES"}
+LEGACY_FIX_CEILING = 1000
+
+def legacy_scale(price, category):
+    scale, rule = 1.0, None
+    if price > LEGACY_CEILING:
+        scale, rule = 0.01, "price_div100"
+    if str(category).upper() in LEGACY_FIX_CATEGORIES and price * scale > LEGACY_FIX_CEILING:
+        scale, rule = scale * 0.1, "price_div10"
+    return scale, rule
+
+def item_key(item, specification):
+    """Sizes and brands of one item are priced apart (e.g. 350 ml vs 1 L oil)"""
+    return f"{item}\x1f{'' if specification != specification or specification is None else specification}"
+
+class PriceDetector:
+    """
+    Online detector for OCR decimal errors in prices.
+
+    Keeps an exponentially weighted mean and variance of the log price per
+    item/specification ([mean, var, n, category]), updated row by row in
+    O(1), and per category the spread of its items' current levels
+    ([sum, sum of squares, n items]). A price more than Z_THRESHOLD sigmas
+    from its item is suspect: it is divided by 10 or 100 when that makes
+    it plausible, otherwise kept and flagged as price_outlier. A first-seen
+    item is only rescaled by the legacy ceilings; its category can flag it
+    as an outlier but never rescale it, so results don't depend on which
+    items happened to come first. Outliers are learned winsorized, so
+    genuine level shifts are picked up over a few surveys without one bad
+    row skewing the stats.
+    """
+
+    def __init__(self, items=None, categories=None):
+        self.items = items or {}
+        self.categories = categories or {}
+
+    @classmethod
+    def load(cls, path=STATE_FILE):
+        """Continue from the saved state (incremental runs)"""
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        try:
+            state = json.loads(path.read_text(encoding="utf-8"))
+        except ValueError:
+            return cls()
+        if state.get("version") != STATE_VERSION:
+            return cls()
+        return cls(state["items"], state["categories"])
+
+    def save(self, path=STATE_FILE):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        state = {"version": STATE_VERSION, "items": self.items, "categories": self.categories}
+        path.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+
+    def expected(self, item):
+        """(mean, sigma) of the item's log price, or None for a new item"""
+        mean, var, n, _ = self.items[item]
+        sigma = sqrt((n * var + PRIOR_WEIGHT * ITEM_PRIOR_SIGMA ** 2) / (n + PRIOR_WEIGHT))
+        return mean, max(sigma, ITEM_MIN_SIGMA)
+
+    def category_level(self, category):
+        """(mean, sigma) of the category's item levels, once it has enough items"""
+        stats = self.categories.get(category)
+        if not stats or stats[2] < CATEGORY_MIN_ITEMS:
+            return None
+        total, squares, n = stats
+        mean = total / n
+        return mean, max(sqrt(max(squares / n - mean * mean, 0.0)), CATEGORY_MIN_SIGMA)
+
+    def check(self, price, item, specification, category):
+        """Return (price, rule) for one row and learn from the result"""
+        if not price > 0:
+            return price, None
+        item = item_key(item, specification)
+        value = log(price)
+
+        if item not in self.items:
+            scale, rule = legacy_scale(price, category)
+            value += log(scale)
+            level = self.category_level(category)
+            if rule is None and level is not None and abs(value - level[0]) > Z_THRESHOLD * level[1]:
+                rule = "price_outlier"
+            # A first price is kept as is (or as the ceilings fixed it)
+            self.learn(item, value, category)
+            return price * scale, rule
+
+        mean, sigma = self.expected(item)
+        scale, rule = 1.0, None
+        if abs(value - mean) > Z_THRESHOLD * sigma:
+            # Most plausible decimal scaling, if any makes the price fit
+            best = min(SCALES, key=lambda s: abs(value + log(s) - mean))
+            if abs(value + log(best) - mean) <= Z_THRESHOLD * sigma:
+                scale, rule = best, SCALES[best]
+                value += log(best)
+            else:
+                rule = "price_outlier"
+                value = mean + Z_THRESHOLD * sigma * (1 if value > mean else -1)
+        self.learn(item, value, category)
+        return price * scale, rule
+
+    def learn(self, item, value, category):
+        """Update the item's EWMA and move its level within its category"""
+        stats = self.items.get(item)
+        if stats is None:
+            old, new = None, value
+            self.items[item] = [value, 0.0, 1, category]
+        else:
+            mean, var, n, category = stats
+            weight = max(1 / (n + 1), MIN_WEIGHT)
+            diff = value - mean
+            old, new = mean, mean + weight * diff
+            self.items[item] = [new, (1 - weight) * (var + weight * diff * diff), n + 1, category]
+
+        total, squares, n_items = self.categories.get(category, [0.0, 0.0, 0])
+        if old is None:
+            n_items += 1
+        else:
+            total, squares = total - old, squares - old * old
+        self.categories[category] = [total + new, squares + new * new, n_items]
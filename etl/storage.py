@@ -0,0 +1,209 @@
+# Typed storage for the datasets passed between pipeline stages.
+# CSV stays the default; NOCHE_STORAGE_FORMAT=parquet keeps cleaned/predicted
+# prices as Parquet datasets partitioned by month and category, so readers
+# load only the columns and partitions they need.
+# `python etl/storage.py export <name>` writes a CSV copy for spreadsheets.
+
+import argparse
+import hashlib
+import operator
+import os
+import shutil
+from pathlib import Path
+import pandas as pd
+
+PROCESSED_DIR = Path("data/processed")
+STORAGE_FORMAT = os.getenv("NOCHE_STORAGE_FORMAT", "csv").lower()
+
+# Typed schemas, in output column order
+SCHEMAS = {
+    "cleaned_prices": {
+        "date": "datetime64[ns]",
+        "category": "object",
+        "item_name": "object",
+        "specification": "object",
+        "price": "float64",
+    },
+    "predicted_prices": {
+        "item_name": "object",
+        "predicted_price": "float64",
+        "date": "datetime64[ns]",
+        "week_num": "int64",
+        "category": "object",
+        "specification": "object",
+    },
+}
+# Same layout for the multi-date forecasts of ml/train_price_model.py --dates
+SCHEMAS["price_forecasts"] = SCHEMAS["predicted_prices"]
+
+# Extra typed columns a dataset may carry; written only when the frame has them
+OPTIONAL_COLUMNS = {
+    "predicted_prices": {
+        "lower_price": "float64",
+        "upper_price": "float64",
+    },
+}
+OPTIONAL_COLUMNS["price_forecasts"] = OPTIONAL_COLUMNS["predicted_prices"]
+SORT_KEYS = {
+    "cleaned_prices": ["date", "category", "item_name", "price"],
+    "predicted_prices": ["item_name"],
+    "price_forecasts": ["date", "item_name"],
+}
+FILL_VALUES = {"specification": ""}
+PARTITION_COLS = ["month", "category"]
+
+FILTER_OPS = {
+    "=": operator.eq, "==": operator.eq, "!=": operator.ne,
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+}
+
+def csv_path(name):
+    return PROCESSED_DIR / f"{name}.csv"
+
+def parquet_path(name):
+    return PROCESSED_DIR / f"{name}.parquet"
+
+def use_parquet(fmt=None):
+    return (fmt or STORAGE_FORMAT) == "parquet"
+
+def dataset_exists(name, fmt=None):
+    return (parquet_path(name) if use_parquet(fmt) else csv_path(name)).exists()
+
+def dataset_digest(name, fmt=None):
+    """SHA-256 of the stored files, cheaper than reading the dataset back"""
+    if use_parquet(fmt):
+        root = parquet_path(name)
+        files = sorted(p for p in root.rglob("*") if p.is_file())
+    else:
+        root = PROCESSED_DIR
+        files = [csv_path(name)]
+    digest = hashlib.sha256()
+    for path in files:
+        digest.update(str(path.relative_to(root)).encode())
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+def full_schema(name):
+    return {**SCHEMAS[name], **OPTIONAL_COLUMNS.get(name, {})}
+
+def output_columns(df, name):
+    return list(SCHEMAS[name]) + [c for c in OPTIONAL_COLUMNS.get(name, {}) if c in df.columns]
+
+def apply_schema(df, name, columns=None):
+    """Cast columns to the dataset schema and fill missing text"""
+    schema = full_schema(name)
+    for col in columns or schema:
+        if col not in df.columns:
+            continue
+        if col in FILL_VALUES:
+            df[col] = df[col].fillna(FILL_VALUES[col])
+        dtype = schema[col]
+        if dtype.startswith("datetime"):
+            df[col] = pd.to_datetime(df[col])
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+def apply_filters(df, filters):
+    """Evaluate pyarrow-style [(col, op, value)] filters on a frame"""
+    mask = pd.Series(True, index=df.index)
+    for col, op, value in filters or []:
+        if op == "in":
+            mask &= df[col].isin(value)
+        elif op == "not in":
+            mask &= ~df[col].isin(value)
+        else:
+            mask &= FILTER_OPS[op](df[col], value)
+    return df[mask]
+
+def with_partitions(df):
+    df = df.copy()
+    df["month"] = pd.to_datetime(df["date"]).dt.strftime("%Y-%m")
+    return df
+
+# Write
+def remove_dataset(name, fmt=None):
+    if use_parquet(fmt):
+        shutil.rmtree(parquet_path(name), ignore_errors=True)
+    else:
+        csv_path(name).unlink(missing_ok=True)
+
+def write_dataset(df, name, fmt=None):
+    """Replace a dataset with df, coerced to its schema"""
+    df = apply_schema(df[output_columns(df, name)].copy(), name)
+    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+    if not use_parquet(fmt):
+        df.to_csv(csv_path(name), index=False)
+        return
+    path = parquet_path(name)
+    remove_dataset(name, fmt)
+    with_partitions(df).to_parquet(path, partition_cols=PARTITION_COLS, index=False)
+
+def append_dataset(df, name, fmt=None):
+    """Add rows without rewriting what is already stored"""
+    df = apply_schema(df[output_columns(df, name)].copy(), name)
+    if not use_parquet(fmt):
+        path = csv_path(name)
+        df.to_csv(path, mode="a", header=not path.exists(), index=False)
+        return
+    # pyarrow writes new uniquely named files into the partition dirs
+    with_partitions(df).to_parquet(parquet_path(name), partition_cols=PARTITION_COLS, index=False)
+
+# Read
+def read_dataset(name, columns=None, filters=None, fmt=None):
+    """
+    Load a dataset with typed columns.
+    columns: subset of schema (or optional) columns to load; by default
+    the schema plus whichever optional columns were stored.
+    filters: [(col, op, value)] predicates; Parquet prunes partitions on
+    month/category and skips row groups on the rest.
+    """
+    schema = full_schema(name)
+    wanted = list(columns or schema)
+    needed = list(dict.fromkeys(wanted + [f[0] for f in filters or []]))
+    # Optional columns are only required when asked for by name
+    keep = set(needed)
+
+    if use_parquet(fmt):
+        # Without a column list, optional columns may be absent; select after reading
+        df = pd.read_parquet(parquet_path(name), columns=needed if columns else None,
+                             filters=filters or None)
+        df = df[[c for c in df.columns if c in keep]]
+    else:
+        dates = [c for c in needed if schema[c].startswith("datetime")]
+        usecols = needed if columns else (lambda c: c in keep)
+        df = pd.read_csv(csv_path(name), usecols=usecols, parse_dates=dates)
+        df = apply_filters(df, filters)
+
+    df = apply_schema(df, name, needed)
+    return df[[c for c in wanted if c in df.columns]].reset_index(drop=True)
+
+def iter_csv_chunks(name, chunksize):
+    """Stream a CSV dataset with its schema applied to each chunk"""
+    for chunk in pd.read_csv(csv_path(name), chunksize=chunksize):
+        yield apply_schema(chunk, name)
+
+# Export
+def export_csv(name):
+    """Write a CSV copy of a Parquet dataset for spreadsheet users"""
+    df = read_dataset(name, fmt="parquet")
+    df = df.sort_values(SORT_KEYS[name]).reset_index(drop=True)
+    df.to_csv(csv_path(name), index=False)
+    return csv_path(name)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline dataset storage")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="write a CSV copy of a Parquet dataset")
+    export.add_argument("name", choices=sorted(SCHEMAS))
+    convert = sub.add_parser("convert", help="write a Parquet copy of a CSV dataset")
+    convert.add_argument("name", choices=sorted(SCHEMAS))
+    args = parser.parse_args()
+
+    if args.command == "export":
+        print(f"Exported {export_csv(args.name)}")
+    else:
+        write_dataset(read_dataset(args.name, fmt="csv"), args.name, fmt="parquet")
+        print(f"Wrote {parquet_path(args.name)}")
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+import pandas as pd
+
+# Paths
+ARTIFACT_DIR = Path("data/processed/model_artifacts")
+INDEX_FILE = "index.json"
+MAX_BYTES = int(float(os.getenv("NOCHE_ARTIFACT_MAX_MB", 50)) * 1024 * 1024)
+
+# Source files whose changes invalidate every artifact
+CODE_FILES = ["forecast.py", "feature_store.py", "train_price_model.py"]
+
+def code_version():
+    digest = hashlib.sha256()
+    for name in CODE_FILES:
+        digest.update((Path(__file__).parent / name).read_bytes())
+    return digest.hexdigest()[:16]
+
+def artifact_key(data_digest, config, code=None):
+    """Hash of the input data, the model config and the code version"""
+    payload = json.dumps(
+        {"data": data_digest, "config": config, "code": code or code_version()},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:20]
+
+class ArtifactCache:
+    """
+    Versioned model artifacts (fitted parameters + predictions), one pickle
+    per key with an index.json alongside. The index also records which key
+    each dataset was last published from and the digest of what was
+    written, so an unchanged rerun can skip rewriting it and the database
+    upload, while a dataset rewritten by anything else is republished. Least recently used artifacts
+    are evicted once the directory exceeds max_bytes.
+    """
+
+    def __init__(self, path=ARTIFACT_DIR, max_bytes=MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.index = {"artifacts": {}, "published": {}}
+        index_file = self.path / INDEX_FILE
+        if index_file.exists():
+            try:
+                self.index = json.loads(index_file.read_text(encoding="utf-8"))
+            except ValueError:
+                pass
+
+    def file(self, key):
+        return self.path / f"{key}.pkl"
+
+    def load(self, key):
+        """Return the artifact dict for key, or None"""
+        entry = self.index["artifacts"].get(key)
+        if entry is None or not self.file(key).exists():
+            return None
+        entry["last_used"] = time.time()
+        self.write_index()
+        return pd.read_pickle(self.file(key))
+
+    def save(self, key, artifact, meta=None):
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp = self.file(key).with_suffix(".tmp")
+        pd.to_pickle(artifact, tmp)
+        tmp.replace(self.file(key))
+        now = time.time()
+        self.index["artifacts"][key] = {
+            **(meta or {}),
+            "bytes": self.file(key).stat().st_size,
+            "created": now,
+            "last_used": now,
+        }
+        self.evict(keep=key)
+        self.write_index()
+
+    # Publishing
+    def published(self, dataset):
+        """{"key", "digest"} the dataset was last published with, or None"""
+        entry = self.index["published"].get(dataset)
+        return entry if isinstance(entry, dict) else None
+
+    def is_published(self, dataset, key, digest):
+        """True if dataset still holds exactly what key published"""
+        entry = self.published(dataset)
+        return entry is not None and entry["key"] == key and entry["digest"] == digest
+
+    def mark_published(self, dataset, key, digest):
+        self.index["published"][dataset] = {"key": key, "digest": digest}
+        self.write_index()
+
+    # Eviction
+    def evict(self, keep=None):
+        """Drop least recently used artifacts until under max_bytes"""
+        entries = self.index["artifacts"]
+        total = sum(e["bytes"] for e in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= entries.pop(key)["bytes"]
+            self.file(key).unlink(missing_ok=True)
+            for dataset, published in list(self.index["published"].items()):
+                if not isinstance(published, dict) or published["key"] == key:
+                    del self.index["published"][dataset]
+
+    def write_index(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        (self.path / INDEX_FILE).write_text(json.dumps(self.index, indent=2), encoding="utf-8")
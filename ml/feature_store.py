@@ -0,0 +1,88 @@
+import hashlib
+from pathlib import Path
+import pandas as pd
+
+from ml.forecast import fit_items
+
+# Paths
+STORE_DIR = Path("data/processed/feature_store")
+STORE_KEEP = 5  # newest feature sets kept on disk
+
+# Bump when the features or the model change shape, so old files are ignored
+FEATURE_VERSION = 2
+
+# Features
+def item_features(df):
+    """
+    One row per item: the category and specification of its earliest row,
+    its last price and December mean, as used by the markup model
+    """
+    df = df.sort_values("date", kind="stable")
+    features = df.groupby("item_name").agg(
+        category=("category", "first"),
+        specification=("specification", "first"),
+        last_price=("price", "last"),
+    )
+    features["dec_mean"] = df["price"].where(df["date"].dt.month == 12).groupby(df["item_name"]).mean()
+    return features
+
+def data_key(df, markup=None):
+    """Hash of the price rows plus everything else the features depend on"""
+    digest = hashlib.sha256(f"v{FEATURE_VERSION}|markup={markup}".encode())
+    columns = ["date", "category", "item_name", "specification", "price"]
+    digest.update(pd.util.hash_pandas_object(df[columns], index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+class FeatureStore:
+    """
+    Item features and fitted trend models for one cleaned price frame,
+    computed once and cached on disk under a hash of the data. Later
+    calls with the same data (in this process or a new one) reuse them;
+    new data gets a new key.
+    """
+
+    def __init__(self, path=STORE_DIR):
+        self.path = Path(path)
+        self.loaded = {}
+        self.stats = {"memory": 0, "disk": 0, "computed": 0}
+
+    def file(self, key):
+        return self.path / f"{key}.pkl"
+
+    def get(self, df, markup=None, workers=None, fits=True):
+        """
+        Return {"items", "fits"} frames for df. The trend fits are only
+        computed when asked for (fits=True); markup-only callers get
+        {"items"} until then.
+        """
+        key = data_key(df, markup)
+        features = self.loaded.get(key)
+        if features is not None and (not fits or "fits" in features):
+            self.stats["memory"] += 1
+            return features
+
+        path = self.file(key)
+        if features is None and path.exists():
+            features = pd.read_pickle(path)
+            if not fits or "fits" in features:
+                self.stats["disk"] += 1
+                self.loaded[key] = features
+                return features
+
+        features = features or {"items": item_features(df)}
+        if fits:
+            features["fits"] = fit_items(df, markup, workers)
+        self.save(path, features)
+        self.stats["computed"] += 1
+        self.loaded[key] = features
+        return features
+
+    def save(self, path, features):
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        pd.to_pickle(features, tmp)
+        tmp.replace(path)
+        # Keep only the newest few feature sets
+        files = sorted(self.path.glob("*.pkl"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for old in files[STORE_KEEP:]:
+            old.unlink(missing_ok=True)
@@ -0,0 +1,194 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Per-item log-price model, fitted for every item at once:
+#   log(price) = level + trend * years_to_target + uplift * holiday
+# Prices are pivoted into a padded item x date matrix (NaN where an item was
+# not surveyed) and each item's normal equations are built from the shared
+# date features with the padding masked out, so the whole catalogue is one
+# batched np.linalg.inv (the inverses also give the interval widths).
+# Ridge priors keep short histories sane: the trend shrinks towards flat and
+# the uplift towards the markup seen in prior years.
+
+# Config
+TARGET_DATE = datetime(2025, 12, 24)  # Christmas Eve
+DEFAULT_MARKUP = 0.12  # used when no prior season has holiday data
+HOLIDAY_START = (12, 16)  # Simbang Gabi through the New Year
+HOLIDAY_END = (1, 6)
+PRE_HOLIDAY_START = 1  # Dec 1-15 is the pre-holiday baseline for the markup
+
+LEVEL_PRIOR = 1e-6
+TREND_PRIOR = 0.5  # worth half an observation a year from the target
+UPLIFT_PRIOR = 2.0  # worth two holiday observations
+VARIANCE_PRIOR = 4  # pseudo-observations of the pooled residual variance
+INTERVAL_Z = 1.6449  # 90% prediction interval
+CHUNK_SIZE = 5000
+
+# Date features
+def is_holiday(dates):
+    dates = pd.DatetimeIndex(dates)
+    month, day = dates.month, dates.day
+    return (
+        ((month == HOLIDAY_START[0]) & (day >= HOLIDAY_START[1]))
+        | ((month == HOLIDAY_END[0]) & (day <= HOLIDAY_END[1]))
+    )
+
+def season_of(dates):
+    """Holiday season a date belongs to, named by its December"""
+    dates = pd.DatetimeIndex(dates)
+    return np.where(dates.month == 1, dates.year - 1, dates.year)
+
+def design_matrix(dates, target_date):
+    """[1, years to target, holiday] per date; zero trend means 'at the target'"""
+    dates = pd.DatetimeIndex(dates)
+    years = (dates - pd.Timestamp(target_date)).days.to_numpy() / 365.25
+    return np.column_stack([np.ones(len(dates)), years, is_holiday(dates).astype(float)])
+
+def price_matrix(df):
+    """Pivot cleaned prices into (items, dates, log-price matrix with NaN padding)"""
+    logs = df.assign(log_price=np.log(df["price"].where(df["price"] > 0)))
+    matrix = logs.pivot_table(index="item_name", columns="date", values="log_price", aggfunc="mean")
+    return matrix.index, pd.DatetimeIndex(matrix.columns), matrix.to_numpy()
+
+# Markup
+def estimate_markup(df, target_date=TARGET_DATE, default=DEFAULT_MARKUP):
+    """
+    Median holiday uplift over the Dec 1-15 price, across every item and
+    season before the target's. Returns (markup, item-seasons used).
+    """
+    dates = pd.DatetimeIndex(df["date"])
+    season = season_of(dates)
+    prior = (season < season_of([target_date])[0]) & (df["price"] > 0).to_numpy()
+    holiday = is_holiday(dates)
+    pre = (dates.month == 12) & (dates.day >= PRE_HOLIDAY_START) & ~holiday
+
+    frame = pd.DataFrame({
+        "item_name": df["item_name"].to_numpy(),
+        "season": season,
+        "holiday": holiday,
+        "log_price": np.log(df["price"].where(df["price"] > 0)).to_numpy(),
+    })[prior & (holiday | pre)]
+    means = frame.groupby(["item_name", "season", "holiday"])["log_price"].mean().unstack("holiday")
+    if True not in means or False not in means:
+        return default, 0
+    uplift = (means[True] - means[False]).dropna()
+    if uplift.empty:
+        return default, 0
+    return float(np.expm1(uplift.median())), len(uplift)
+
+# Fitting
+def fit_chunk(Y, X, prior_mean, prior_precision):
+    """
+    Masked ridge least squares for a block of items.
+    Y: (items, dates) log prices with NaN padding; X: (dates, k) features.
+    Returns coefficients (items, k), inverse normal matrices (items, k, k),
+    residual sums of squares and observation counts.
+    """
+    mask = ~np.isnan(Y)
+    W = mask.astype(float)
+    Y0 = np.where(mask, Y, 0.0)
+
+    # X' diag(w_i) X + P and X' diag(w_i) y_i + P m, for every item i
+    A = np.einsum("nd,dk,dl->nkl", W, X, X) + np.diag(prior_precision)
+    b = Y0 @ X + prior_precision * prior_mean
+    A_inv = np.linalg.inv(A)
+    coef = np.einsum("nkl,nl->nk", A_inv, b)
+
+    resid = np.where(mask, Y0 - coef @ X.T, 0.0)
+    return coef, A_inv, (resid ** 2).sum(axis=1), mask.sum(axis=1)
+
+def _fit_task(task):
+    return fit_chunk(*task)
+
+def fit(Y, X, prior_mean, prior_precision, workers=None, chunk_size=CHUNK_SIZE):
+    """Fit all items, splitting them over worker processes in chunks"""
+    chunks = [Y[i:i + chunk_size] for i in range(0, len(Y), chunk_size)] or [Y]
+    tasks = [(chunk, X, prior_mean, prior_precision) for chunk in chunks]
+    if workers and workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_fit_task, tasks))
+    else:
+        results = [_fit_task(t) for t in tasks]
+    return [np.concatenate(parts) for parts in zip(*results)]
+
+# Forecast
+COEF_COLUMNS = ["level", "trend", "uplift"]
+COV_COLUMNS = [f"cov_{i}{j}" for i in range(3) for j in range(3)]
+
+def fit_items(df, markup=None, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Fit every item once; predictions for any target date come from this.
+    Returns one row per item with the coefficients, the inverse normal
+    matrix (cov_*) and the residual variance. frame.attrs["markup"] holds
+    the uplift prior that was used.
+    """
+    if markup is None:
+        markup, _ = estimate_markup(df, df["date"].max())
+
+    items, dates, Y = price_matrix(df)
+    X = design_matrix(dates, TARGET_DATE)
+    prior_mean = np.array([0.0, 0.0, np.log1p(markup)])
+    prior_precision = np.array([LEVEL_PRIOR, TREND_PRIOR, UPLIFT_PRIOR])
+    coef, A_inv, rss, n_obs = fit(Y, X, prior_mean, prior_precision, workers, chunk_size)
+
+    # Residual variance shrunk towards the pooled one, so items with one
+    # or two prices still get an honest interval width
+    pooled = max(rss.sum() / max(n_obs.sum(), 1), 1e-6)
+    variance = (rss + VARIANCE_PRIOR * pooled) / (n_obs + VARIANCE_PRIOR)
+
+    fits = pd.DataFrame(
+        np.column_stack([coef, A_inv.reshape(len(items), -1), variance]),
+        index=items,
+        columns=COEF_COLUMNS + COV_COLUMNS + ["variance"],
+    )
+    fits.attrs["markup"] = markup
+    return fits
+
+def predict_fits(fits, target_dates):
+    """(mean, spread) log-price matrices of shape (items, dates)"""
+    X = design_matrix(target_dates, TARGET_DATE)
+    coef = fits[COEF_COLUMNS].to_numpy()
+    A_inv = fits[COV_COLUMNS].to_numpy().reshape(-1, 3, 3)
+    mean = coef @ X.T
+    leverage = np.einsum("dk,nkl,dl->nd", X, A_inv, X)
+    spread = INTERVAL_Z * np.sqrt(fits["variance"].to_numpy()[:, None] * (1 + leverage))
+    return mean, spread
+
+def forecast_frame(fits, attrs, target_dates):
+    """
+    Long predicted_prices frame (with intervals) for every item x date.
+    attrs: category/specification per item, indexed like fits.
+    """
+    target_dates = pd.DatetimeIndex(target_dates)
+    mean, spread = predict_fits(fits, target_dates)
+    n_items, n_dates = mean.shape
+
+    pred_df = pd.DataFrame({
+        "item_name": np.tile(fits.index.to_numpy(), n_dates),
+        "predicted_price": np.exp(mean.T.ravel()).round(2),
+    })
+    pred_df["date"] = np.repeat(target_dates.to_numpy(), n_items)
+    pred_df["week_num"] = np.repeat(target_dates.isocalendar().week.to_numpy(dtype="int64"), n_items)
+    pred_df["category"] = np.tile(attrs["category"].reindex(fits.index).to_numpy(), n_dates)
+    pred_df["specification"] = np.tile(attrs["specification"].reindex(fits.index).to_numpy(), n_dates)
+    pred_df["lower_price"] = np.exp((mean - spread).T.ravel()).round(2)
+    pred_df["upper_price"] = np.exp((mean + spread).T.ravel()).round(2)
+    return pred_df
+
+def item_attrs(df):
+    """Category and specification of each item's earliest row"""
+    return df.sort_values("date", kind="stable").groupby("item_name").agg(
+        category=("category", "first"),
+        specification=("specification", "first"),
+    )
+
+def forecast(df, target_date=TARGET_DATE, markup=None, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Predict each item's price on target_date with a 90% interval.
+    markup: holiday uplift prior; estimated from prior seasons when None.
+    Returns the predicted_prices frame plus lower_price/upper_price.
+    """
+    fits = fit_items(df, markup, workers, chunk_size)
+    return forecast_frame(fits, item_attrs(df), [target_date])
@@ -1,10 +1,18 @@
-import pandas as pd
+import sys
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+import heapq
+import numpy as np
 import json
-from itertools import product
 
-# Load CSV
-df = pd.read_csv("data/processed/predicted_prices.csv")
-df["specification"] = df["specification"].fillna("")
+# Add project root to sys.path so 'etl' can be imported
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT_DIR))
+
+from etl.storage import read_dataset
+
+MENU_FILE = "data/processed/nochebuena_full_menu.json"
 
 # Full Noche Buena Menu (100+ dishes)
 # Format: Category -> Dish Name -> List of possible ingredients
@@ -127,6 +135,7 @@ INGREDIENT_MAP = {
 }
 
 # Helper functions
+@lru_cache(maxsize=None)
 def canonical_ingredient(name):
     """Map ingredient names to canonical types for flexible matching"""
     name_lower = name.lower()
@@ -153,35 +162,150 @@ def estimate_serving_size(category, dish_name):
     else:
         return 1
 
-def compute_dish_cost(ingredients, df):
-    """Compute total cost and track which ingredients are available/missing"""
+# Price index
+class PriceIndex:
+    """
+    Item name -> price row (predicted_price, plus category/specification
+    when loaded), built once per price snapshot for O(1) lookups. The
+    first row wins for a repeated name, as the old frame scans did.
+    """
+
+    def __init__(self, df):
+        first = df.drop_duplicates("item_name")
+        self.rows = first.set_index("item_name").to_dict("index")
+        # Lower-cased name -> item name, for ingredients matched case-insensitively
+        self.names = {}
+        for name in self.rows:
+            self.names.setdefault(name.lower(), name)
+
+    def __contains__(self, name):
+        return name in self.rows
+
+    def get(self, name):
+        return self.rows.get(name)
+
+    def price(self, name, default=None):
+        row = self.rows.get(name)
+        return float(row["predicted_price"]) if row is not None else default
+
+    def find(self, lowered):
+        """Item name whose lower-cased form is `lowered`, or None"""
+        return self.names.get(lowered)
+
+def compute_dish_cost(ingredients, prices):
+    """
+    Compute total cost and track which ingredients are available/missing.
+    prices: a PriceIndex (or a predicted price frame, indexed on the fly).
+    """
+    if not isinstance(prices, PriceIndex):
+        prices = PriceIndex(prices)
     total = 0
     used = []
     missing = []
     for ing in ingredients:
-        row = df[df["item_name"] == ing]
-        if not row.empty:
-            total += float(row["predicted_price"].values[0])
+        price = prices.price(ing)
+        if price is not None:
+            total += price
             used.append(ing)
         else:
             missing.append(ing)
     return round(total, 2), used, missing
 
 # Build full menu with prices & serving size
-FULL_MENU = []
-for cat, dishes in MENU.items():
-    for dish_name, ingredients in dishes.items():
-        cost, used, missing = compute_dish_cost(ingredients, df)
-        serving_size = estimate_serving_size(cat, dish_name)
-        FULL_MENU.append({
-            "category": cat,
-            "dish": dish_name,
-            "total_price": cost,
-            "serving_size": serving_size,
-            "ingredients": used,
-            "missing_ingredients": missing,
-            "price_warning": cost > 500
-        })
+def build_full_menu(df):
+    """Cost every dish in MENU against a predicted price frame, indexed once"""
+    prices = PriceIndex(df)
+    full_menu = []
+    for cat, dishes in MENU.items():
+        for dish_name, ingredients in dishes.items():
+            cost, used, missing = compute_dish_cost(ingredients, prices)
+            serving_size = estimate_serving_size(cat, dish_name)
+            full_menu.append({
+                "category": cat,
+                "dish": dish_name,
+                "total_price": cost,
+                "serving_size": serving_size,
+                "ingredients": used,
+                "missing_ingredients": missing,
+                "price_warning": cost > 500
+            })
+    return full_menu
+
+# Suggestion engine
+class SuggestionIndex:
+    """
+    Dishes precompiled for cart matching: each dish's ingredient keys as
+    an integer bitset, plus a key -> dishes inverted index. A query only
+    visits dishes sharing a key with the cart, counting matches from the
+    postings, and picks the best k with a heap. key maps an ingredient
+    name to the form dishes and cart are compared in.
+    """
+
+    def __init__(self, dishes, key=canonical_ingredient):
+        self.dishes = list(dishes)
+        self.key = key
+        self.bits = {}  # ingredient key -> bit position
+        self.keys = []  # bit position -> ingredient key
+        self.masks = []
+        postings = defaultdict(list)
+        for i, dish in enumerate(self.dishes):
+            mask = 0
+            for ing in dish["ingredients"]:
+                k = key(ing)
+                bit = self.bits.get(k)
+                if bit is None:
+                    bit = self.bits[k] = len(self.keys)
+                    self.keys.append(k)
+                if not mask >> bit & 1:
+                    postings[k].append(i)
+                mask |= 1 << bit
+            self.masks.append(mask)
+        self.postings = {k: np.array(ids, dtype=np.int32) for k, ids in postings.items()}
+        self.sizes = np.array([mask.bit_count() for mask in self.masks], dtype=np.int32)
+
+    def mask(self, names):
+        """Bitset of the (known) keys of these ingredient names"""
+        mask = 0
+        for name in names:
+            bit = self.bits.get(self.key(name))
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def names(self, mask):
+        """Ingredient keys of a bitset, in first-seen order"""
+        names = []
+        while mask:
+            low = mask & -mask
+            names.append(self.keys[low.bit_length() - 1])
+            mask ^= low
+        return names
+
+    def counts(self, names):
+        """Per dish, how many of these ingredients it uses (from the postings only)"""
+        lists = [self.postings[k] for k in {self.key(n) for n in names} if k in self.postings]
+        if not lists:
+            return np.zeros(len(self.dishes), dtype=np.int64)
+        return np.bincount(np.concatenate(lists), minlength=len(self.dishes))
+
+    def top(self, cart_names, k=10, min_match=1, score=None):
+        """
+        Best k dishes for a cart as [(dish index, missing-key bitset)].
+        score(ids, matched, missing) ranks dishes from arrays (default:
+        matched count); ties keep menu order.
+        """
+        matched = self.counts(cart_names)
+        ids = np.flatnonzero(matched >= max(min_match, 1))
+        matched = matched[ids]
+        scores = matched if score is None else score(ids, matched, self.sizes[ids] - matched)
+        # Only dishes scoring at least the k-th best can make the cut
+        if len(ids) > k:
+            keep = scores >= np.partition(scores, -k)[-k]
+            ids, scores = ids[keep], scores[keep]
+        ranked = heapq.nlargest(k, zip(scores.tolist(), (-ids).tolist()))
+
+        cart = self.mask(cart_names)
+        return [(-neg_i, self.masks[-neg_i] & ~cart) for _, neg_i in ranked]
 
 # Flexible meal suggestion
 def suggest_meals(cart_items, full_menu, max_results=10):
@@ -189,30 +313,31 @@ def suggest_meals(cart_items, full_menu, max_results=10):
     Suggest dishes based on items in cart.
     - Flexible: any variant of ingredient counts.
     - Show missing ingredients for each dish.
+    full_menu may be a SuggestionIndex, to reuse it across calls.
     """
-    cart_ing = set(canonical_ingredient(i["item"]) for i in cart_items)
+    index = full_menu if isinstance(full_menu, SuggestionIndex) else SuggestionIndex(full_menu)
     suggestions = []
-    for dish in full_menu:
-        dish_ing = set(canonical_ingredient(ing) for ing in dish["ingredients"])
-        matched = dish_ing & cart_ing  # ingredients already in cart
-        missing = dish_ing - cart_ing  # ingredients user still needs
-        if matched:
-            suggestions.append({
-                "dish": dish["dish"],
-                "category": dish["category"],
-                "total_price": dish["total_price"],
-                "serving_size": dish["serving_size"],
-                "ingredients": dish["ingredients"],
-                "missing_ingredients": list(missing)
-            })
-    # sort suggestions by number of matched ingredients, descending
-    suggestions = sorted(suggestions, key=lambda x: len(set(canonical_ingredient(i) for i in x["ingredients"]) & cart_ing), reverse=True)
-    return suggestions[:max_results]
+    # ranked by number of matched ingredients, descending
+    for i, missing in index.top([c["item"] for c in cart_items], max_results):
+        dish = index.dishes[i]
+        suggestions.append({
+            "dish": dish["dish"],
+            "category": dish["category"],
+            "total_price": dish["total_price"],
+            "serving_size": dish["serving_size"],
+            "ingredients": dish["ingredients"],
+            "missing_ingredients": index.names(missing)
+        })
+    return suggestions
 
 # Save JSON for dashboard use
-with open("data/processed/nochebuena_full_menu.json", "w") as f:
-    json.dump({
-        "full_menu": FULL_MENU
-    }, f, indent=2)
+def save_full_menu(full_menu, path=MENU_FILE):
+    with open(path, "w") as f:
+        json.dump({
+            "full_menu": full_menu
+        }, f, indent=2)
 
-print("Saved flexible nochebuena_full_menu.json with serving sizes and canonical ingredients.")
+if __name__ == "__main__":
+    df = read_dataset("predicted_prices", columns=["item_name", "predicted_price"])
+    save_full_menu(build_full_menu(df))
+    print("Saved flexible nochebuena_full_menu.json with serving sizes and canonical ingredients.")
@@ -1,5 +1,5 @@
+import argparse
 import sys
-import os
 from pathlib import Path
 import pandas as pd
 import numpy as np
@@ -9,129 +9,259 @@ from datetime import datetime
 ROOT_DIR = Path(__file__).resolve().parents[1]
 sys.path.append(str(ROOT_DIR))
 
-from etl.db import get_connection  # shared DB connection
+from etl.db import connection, execute_values, transaction
+from etl.storage import dataset_digest, dataset_exists, read_dataset, write_dataset
+from ml.artifacts import ArtifactCache, artifact_key
+from ml.feature_store import FeatureStore, item_features
+from ml.forecast import forecast, forecast_frame
 
 # Config
-CSV_FILE = "data/processed/cleaned_prices.csv"
-PREDICT_CSV = "data/processed/predicted_prices.csv"
 TARGET_DATE = datetime(2025, 12, 24)  # Christmas Eve
 CHRISTMAS_MARKUP = 0.12  # 12% markup for Christmas
 
-# Load cleaned prices
-df = pd.read_csv(CSV_FILE)
-df["date"] = pd.to_datetime(df["date"])
-df["specification"] = df["specification"].fillna("")
-df["week_num"] = df["date"].dt.isocalendar().week
-df["month"] = df["date"].dt.month
-
-# Predict prices for Dec 24
-predictions = []
-
-for item_name, group in df.groupby("item_name"):
-    # Use all December historical data
-    dec_prices = group[group["month"] == 12].sort_values("date")
-    if not dec_prices.empty:
-        avg_dec_price = dec_prices["price"].mean()
-        predicted_price = round(avg_dec_price * (1 + CHRISTMAS_MARKUP), 2)
-    else:
-        # Fallback to last known price if no December data
-        predicted_price = group.sort_values("date")["price"].iloc[-1]
+# Predict prices for the target date
+def markup_frame(items, target_dates, markup=CHRISTMAS_MARKUP):
+    """
+    The markup model, shared by every source: each item's December
+    average with the Christmas markup, or its last known price when it
+    has no December data, on every target date (one row per item x date).
+    items: category, specification, dec_mean and last_price per item.
+    """
+    predicted = (items["dec_mean"] * (1 + markup)).round(2)
+    predicted = predicted.fillna(items["last_price"]).clip(lower=0)
 
-    predictions.append({
-        "item_name": item_name,
-        "predicted_price": max(0, predicted_price)
+    target_dates = pd.DatetimeIndex(target_dates)
+    pred_df = pd.DataFrame({
+        "item_name": np.tile(items.index.to_numpy(), len(target_dates)),
+        "predicted_price": np.tile(predicted.to_numpy(), len(target_dates)),
     })
+    pred_df["date"] = np.repeat(target_dates.to_numpy(), len(items))
+    pred_df["week_num"] = np.repeat(target_dates.isocalendar().week.to_numpy(dtype="int64"), len(items))
+    pred_df["category"] = np.tile(items["category"].to_numpy(), len(target_dates))
+    pred_df["specification"] = np.tile(items["specification"].to_numpy(), len(target_dates))
+    return pred_df
+
+def predict(df, target_date=TARGET_DATE, markup=CHRISTMAS_MARKUP):
+    """
+    Return one predicted price per item from a cleaned price frame,
+    aggregating all items in one grouped pass
+    """
+    return markup_frame(item_features(df), [target_date], markup)
+
+# Predict many target dates at once from the cached feature store
+STORE = FeatureStore()
+
+def predict_dates(df, target_dates, model="trend", markup=None, workers=None, store=STORE):
+    """
+    Predict every item on every target date in one call, one row per
+    item x date. Features (and for model="trend" the trend fits) are
+    computed once per distinct price frame and reused from the store
+    afterwards.
+    """
+    trend = model == "trend"
+    features = store.get(df, markup if trend else None, workers, fits=trend)
+    if trend:
+        return forecast_frame(features["fits"], features["items"], target_dates)
+    return markup_frame(features["items"], target_dates, CHRISTMAS_MARKUP if markup is None else markup)
+
+# Predict from the summary tables kept by etl/load_db.py
+# One row per item: December sum/count across years and the latest observed price
+SUMMARY_QUERY = """
+SELECT i.item_name, i.category, i.specification,
+       d.total_price, d.n_prices, l.price AS last_price
+FROM dim_item i
+LEFT JOIN (
+    SELECT item_id, sum(total_price) AS total_price, sum(n_prices) AS n_prices
+    FROM item_december_prices
+    GROUP BY item_id
+) d ON d.item_id = i.item_id
+LEFT JOIN item_latest_price l ON l.item_id = i.item_id
+WHERE d.item_id IS NOT NULL OR l.item_id IS NOT NULL
+ORDER BY i.item_name
+"""
+
+# Aggregate straight from the star schema in one grouped query, for when
+# the summaries are not kept or the history is larger than memory.
+# The last price is fetched through the (item_id, price_date) unique index.
+FACTS_QUERY = """
+WITH agg AS (
+    SELECT item_id,
+           sum(price) FILTER (WHERE EXTRACT(MONTH FROM price_date) = 12) AS total_price,
+           count(*) FILTER (WHERE EXTRACT(MONTH FROM price_date) = 12) AS n_prices,
+           max(price_date) AS last_date
+    FROM fact_prices
+    WHERE NOT is_forecast
+    GROUP BY item_id
+)
+SELECT i.item_name, i.category, i.specification,
+       a.total_price, a.n_prices, f.price AS last_price
+FROM agg a
+JOIN dim_item i ON i.item_id = a.item_id
+JOIN fact_prices f ON f.item_id = a.item_id AND f.price_date = a.last_date
+ORDER BY i.item_name
+"""
+
+def query_frame(query):
+    with connection() as conn, conn.cursor() as cur:
+        cur.execute(query)
+        return pd.DataFrame(cur.fetchall(), columns=[c[0] for c in cur.description])
 
-pred_df = pd.DataFrame(predictions)
-pred_df["date"] = TARGET_DATE
-pred_df["week_num"] = TARGET_DATE.isocalendar()[1]
-pred_df["category"] = df.groupby("item_name")["category"].first().reindex(pred_df["item_name"]).values
-pred_df["specification"] = df.groupby("item_name")["specification"].first().reindex(pred_df["item_name"]).values
+def predict_from_aggregates(df, target_date=TARGET_DATE, markup=CHRISTMAS_MARKUP):
+    """predict() from one row per item of December total/count and last price"""
+    n_prices = df["n_prices"].fillna(0).astype(float)
+    items = pd.DataFrame({
+        "category": df["category"].to_numpy(),
+        "specification": df["specification"].to_numpy(),
+        "dec_mean": (df["total_price"].astype(float) / n_prices.where(n_prices > 0)).to_numpy(),
+        "last_price": df["last_price"].astype(float).to_numpy(),
+    }, index=df["item_name"].to_numpy())
+    return markup_frame(items, [target_date], markup)
 
-# Save predicted prices to CSV
-os.makedirs(os.path.dirname(PREDICT_CSV), exist_ok=True)
-pred_df.to_csv(PREDICT_CSV, index=False)
+def predict_from_summaries(target_date=TARGET_DATE, markup=CHRISTMAS_MARKUP):
+    """
+    Same predictions as predict(), read from the DB summaries instead of
+    raw prices. fact_prices keeps one price per item and date, so items
+    with several cleaned rows on one date average over the first only.
+    """
+    return predict_from_aggregates(query_frame(SUMMARY_QUERY), target_date, markup)
+
+def predict_from_facts(target_date=TARGET_DATE, markup=CHRISTMAS_MARKUP):
+    """
+    Same as predict_from_summaries(), aggregated by the database from
+    fact_prices itself; only one row per item is fetched.
+    """
+    return predict_from_aggregates(query_frame(FACTS_QUERY), target_date, markup)
 
 # DB upsert functions
-from psycopg2.extras import execute_values
+from etl.load_db import ensure_partitions, resolve_keys
 
+# The loader owns the dimension attributes; predictions only add items and
+# dates it hasn't seen, so a train run never invalidates the loader's key cache
 def upsert_items(df):
     items = df[["item_name", "category", "specification"]].drop_duplicates().to_dict(orient="records")
-    conn = get_connection()
-    cur = conn.cursor()
-    execute_values(
-        cur,
-        """
-        INSERT INTO dim_item (item_name, category, specification)
-        VALUES %s
-        ON CONFLICT (item_name) DO UPDATE
-        SET category = EXCLUDED.category,
-            specification = EXCLUDED.specification
-        """,
-        [(i["item_name"], i["category"], i["specification"]) for i in items]
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
+    with transaction() as conn, conn.cursor() as cur:
+        execute_values(
+            cur,
+            """
+            INSERT INTO dim_item (item_name, category, specification)
+            VALUES %s
+            ON CONFLICT (item_name) DO NOTHING
+            """,
+            [(i["item_name"], i["category"], i["specification"]) for i in items]
+        )
 
 def upsert_dates(df):
     dates = df[["date", "week_num"]].drop_duplicates().to_dict(orient="records")
-    conn = get_connection()
-    cur = conn.cursor()
-    execute_values(
-        cur,
-        """
-        INSERT INTO dim_date (date, week_num)
-        VALUES %s
-        ON CONFLICT (date) DO UPDATE
-        SET week_num = EXCLUDED.week_num
-        """,
-        [(d["date"], d["week_num"]) for d in dates]
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
-
-def upsert_prices(df):
-    conn = get_connection()
-    cur = conn.cursor()
-
-    # Fetch existing mappings
-    cur.execute("SELECT item_id, item_name FROM dim_item")
-    item_map = {name: iid for iid, name in cur.fetchall()}
-    cur.execute("SELECT date_id, date FROM dim_date")
-    date_map = {date: did for did, date in cur.fetchall()}
-
-    price_values = []
-    seen_pairs = set()
-    for _, row in df.iterrows():
-        iid = item_map.get(row["item_name"])
-        did = date_map.get(row["date"].date())
-        if iid and did:
-            key = (iid, did)
-            if key not in seen_pairs:
-                price_values.append((iid, did, row["predicted_price"]))
-                seen_pairs.add(key)
-
-    if price_values:
+    with transaction() as conn, conn.cursor() as cur:
         execute_values(
             cur,
             """
-            INSERT INTO fact_prices (item_id, date_id, price)
+            INSERT INTO dim_date (date, week_num)
             VALUES %s
-            ON CONFLICT (item_id, date_id) DO UPDATE
-            SET price = EXCLUDED.price
+            ON CONFLICT (date) DO NOTHING
             """,
-            price_values
+            [(d["date"], d["week_num"]) for d in dates]
         )
 
-    conn.commit()
-    cur.close()
-    conn.close()
+def upsert_prices(df):
+    with transaction() as conn, conn.cursor() as cur:
+        price_values = resolve_keys(cur, df, price_col="predicted_price")
+
+        if price_values:
+            ensure_partitions(cur, [v[2] for v in price_values])
+            # Flagged as forecasts; never overwrite an observed price
+            execute_values(
+                cur,
+                """
+                INSERT INTO fact_prices (item_id, date_id, price_date, price, is_forecast)
+                VALUES %s
+                ON CONFLICT (item_id, price_date) DO UPDATE
+                SET price = EXCLUDED.price
+                WHERE fact_prices.is_forecast
+                """,
+                [(*v, True) for v in price_values]
+            )
+
+def upload(pred_df):
+    """Upsert predictions into dim_item, dim_date and fact_prices in one transaction"""
+    with transaction():
+        upsert_items(pred_df)
+        upsert_dates(pred_df)
+        upsert_prices(pred_df)
 
-# Run upserts
-upsert_items(pred_df)
-upsert_dates(pred_df)
-upsert_prices(pred_df)
+# Model artifacts
+# A run from cleaned_prices is keyed by the dataset's file hash, the model
+# config and the code version; an identical rerun reuses its artifact.
+ARTIFACTS = ArtifactCache()
 
-print("Predicted prices for Dec 24 with Christmas markup saved and upserted into DB")
+def run(model="markup", target_dates=(TARGET_DATE,), dataset="predicted_prices",
+        workers=None, force=False, artifacts=ARTIFACTS):
+    """
+    Predict from cleaned_prices, write `dataset` and upsert it into the DB.
+    Returns (pred_df, status): "unchanged" when the same inputs were
+    already published (nothing is written), "cached" when the artifact
+    was reused, "trained" otherwise. force=True retrains and republishes.
+    """
+    target_dates = [pd.Timestamp(d) for d in target_dates]
+    config = {
+        "model": model,
+        "target_dates": [d.strftime("%Y-%m-%d") for d in target_dates],
+        "markup": CHRISTMAS_MARKUP if model == "markup" else "estimated",
+    }
+    key = artifact_key(dataset_digest("cleaned_prices"), config)
+
+    artifact = None if force else artifacts.load(key)
+    # The digest catches the dataset being rewritten by --source db/facts
+    # or the pipeline since it was published from this key
+    if (artifact is not None and dataset_exists(dataset)
+            and artifacts.is_published(dataset, key, dataset_digest(dataset))):
+        return artifact["predictions"], "unchanged"
+
+    status = "cached"
+    if artifact is None:
+        df = read_dataset("cleaned_prices")
+        pred_df = predict_dates(df, target_dates, model, workers=workers)
+        features = STORE.get(df, None, workers, fits=model == "trend")
+        params = features["fits"] if model == "trend" else features["items"][["dec_mean", "last_price"]]
+        artifact = {"config": config, "params": params, "predictions": pred_df}
+        artifacts.save(key, artifact, meta={**config, "dataset": dataset})
+        status = "trained"
+
+    write_dataset(artifact["predictions"], dataset)
+    upload(artifact["predictions"])
+    artifacts.mark_published(dataset, key, dataset_digest(dataset))
+    return artifact["predictions"], status
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Predict Noche Buena prices for Christmas Eve")
+    parser.add_argument("--source", choices=["dataset", "db", "facts"], default="dataset",
+                        help="raw cleaned prices (default), the DB summary tables, "
+                             "or per-item aggregates computed by the DB from fact_prices")
+    parser.add_argument("--model", choices=["markup", "trend"], default="markup",
+                        help="December average x markup (default) or the per-item trend/holiday model")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes for fitting the trend model across item chunks")
+    parser.add_argument("--dates", default=None,
+                        help="comma-separated target dates (YYYY-MM-DD); writes price_forecasts")
+    parser.add_argument("--force", action="store_true",
+                        help="retrain and republish even if the inputs are unchanged")
+    args = parser.parse_args()
+
+    if args.source in ("db", "facts"):
+        pred_df = predict_from_summaries() if args.source == "db" else predict_from_facts()
+        # Save predicted prices (CSV or Parquet, see etl/storage.py)
+        write_dataset(pred_df, "predicted_prices")
+        upload(pred_df)
+        print("Predicted prices for Dec 24 with Christmas markup saved and upserted into DB")
+    else:
+        # Multi-date forecasts go to their own dataset; predicted_prices stays Dec 24 only
+        if args.dates:
+            dates = [pd.Timestamp(d.strip()) for d in args.dates.split(",") if d.strip()]
+            dataset = "price_forecasts"
+        else:
+            dates, dataset = [TARGET_DATE], "predicted_prices"
+        pred_df, status = run(args.model, dates, dataset, args.workers, args.force)
+        if status == "unchanged":
+            print(f"Inputs unchanged; {dataset} and the DB are already up to date")
+        else:
+            print(f"Predicted {len(pred_df)} item x date prices ({status}), saved to {dataset} and upserted into DB")
@@ -0,0 +1,123 @@
+# Runs extract -> clean -> load -> predict -> menu in one process.
+# Frames are handed from stage to stage in memory; each stage still writes
+# its usual output so the dashboard and the standalone scripts keep working.
+
+import argparse
+import sys
+import time
+from pathlib import Path
+import pandas as pd
+
+# Add project root to sys.path so 'etl' and 'ml' can be imported
+ROOT_DIR = Path(__file__).resolve().parent
+sys.path.append(str(ROOT_DIR))
+
+from etl import storage
+from etl.dates import DEFAULT_YEAR
+
+STAGES = ["extract", "clean", "load", "predict", "menu"]
+
+# Stages
+# Each takes the previous stage's frame (or None) and returns its own.
+# Imports are local so each stage only loads the modules it needs.
+
+def extract_stage(_, args):
+    from etl import extract_pdf
+    extract_pdf.extract(args.workers)
+    return pd.read_csv(extract_pdf.OUTPUT_FILE)
+
+def clean_stage(raw_df, args):
+    from etl import clean_prices
+    from etl.cleaning_metrics import CleaningMetrics
+    from etl.price_anomaly import PriceDetector
+    if raw_df is None:
+        raw_df = pd.read_csv(clean_prices.INPUT_FILE)
+    metrics = CleaningMetrics()
+    detector = PriceDetector()
+    df = clean_prices.clean(raw_df, metrics, args.year, detector)
+    storage.write_dataset(df, "cleaned_prices")
+    # Same bookkeeping as a full clean_prices.py run, so a later
+    # --incremental run continues from here instead of re-appending
+    clean_prices.finish_run(df["date"].max() if not df.empty else None, metrics, detector)
+    return df
+
+def load_stage(df, args):
+    if df is None:
+        df = storage.read_dataset("cleaned_prices")
+    if not args.no_db:
+        from etl import load_db
+        load_db.load(df)
+    return df
+
+def predict_stage(df, args):
+    from ml import train_price_model
+    if df is None:
+        df = storage.read_dataset("cleaned_prices")
+    if args.model == "trend":
+        pred_df = train_price_model.forecast(df, workers=args.workers)
+    else:
+        pred_df = train_price_model.predict(df)
+    storage.write_dataset(pred_df, "predicted_prices")
+    if not args.no_db:
+        train_price_model.upload(pred_df)
+    return pred_df
+
+def menu_stage(pred_df, args):
+    from ml import meal_optimizer
+    if pred_df is None:
+        pred_df = storage.read_dataset("predicted_prices", columns=["item_name", "predicted_price"])
+    full_menu = meal_optimizer.build_full_menu(pred_df)
+    meal_optimizer.save_full_menu(full_menu)
+    return pd.DataFrame(full_menu)
+
+STAGE_FUNCS = {
+    "extract": extract_stage,
+    "clean": clean_stage,
+    "load": load_stage,
+    "predict": predict_stage,
+    "menu": menu_stage,
+}
+
+def run(stages, args):
+    """Run the given stages in pipeline order, returning (frames, timings)"""
+    frames = {}
+    timings = {}
+    frame = None
+    for stage in STAGES:
+        if stage not in stages:
+            frame = None
+            continue
+        start = time.perf_counter()
+        frame = STAGE_FUNCS[stage](frame, args)
+        timings[stage] = time.perf_counter() - start
+        frames[stage] = frame
+    return frames, timings
+
+def report(frames, timings):
+    total = sum(timings.values())
+    print(f"{'stage':<10}{'rows':>8}{'seconds':>10}")
+    for stage, seconds in timings.items():
+        print(f"{stage:<10}{len(frames[stage]):>8}{seconds:>10.3f}")
+    print(f"{'total':<10}{'':>8}{total:>10.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Noche Buena pipeline in one process")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help=f"comma-separated subset of {','.join(STAGES)}")
+    parser.add_argument("--no-db", action="store_true",
+                        help="skip the database writes in load and predict")
+    parser.add_argument("--year", type=int, default=DEFAULT_YEAR,
+                        help="year for leading days that carry no year of their own")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="PDF extraction and trend-fitting processes")
+    parser.add_argument("--model", choices=["markup", "trend"], default="markup",
+                        help="price model for the predict stage")
+    args = parser.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    frames, timings = run(stages, args)
+    report(frames, timings)
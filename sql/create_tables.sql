@@ -14,13 +14,60 @@ CREATE TABLE IF NOT EXISTS dim_date (
 );
 
 -- PRICE fact table
+-- Range-partitioned by price_date, one partition per year. load_db.py
+-- creates missing yearly partitions before each load; an old year can be
+-- archived with ALTER TABLE fact_prices DETACH PARTITION fact_prices_<year>.
+-- Unique keys on a partitioned table must include price_date, so the
+-- natural key is (item_id, price_date); date_id still links to dim_date.
 CREATE TABLE IF NOT EXISTS fact_prices (
-    price_id SERIAL PRIMARY KEY,
+    price_id BIGSERIAL,
     item_id INT NOT NULL REFERENCES dim_item(item_id),
     date_id INT NOT NULL REFERENCES dim_date(date_id),
+    price_date DATE NOT NULL,
     price NUMERIC(10,2) NOT NULL CHECK (price >= 0),
-    UNIQUE (item_id, date_id)
+    is_forecast BOOLEAN NOT NULL DEFAULT false,
+    PRIMARY KEY (price_id, price_date),
+    UNIQUE (item_id, price_date)
+) PARTITION BY RANGE (price_date);
+
+-- Predicted prices uploaded by ml/train_price_model.py are flagged so the
+-- summary tables only aggregate observed prices
+ALTER TABLE fact_prices ADD COLUMN IF NOT EXISTS is_forecast BOOLEAN NOT NULL DEFAULT false;
+
+CREATE TABLE IF NOT EXISTS fact_prices_2025 PARTITION OF fact_prices
+    FOR VALUES FROM ('2025-01-01') TO ('2026-01-01');
+
+CREATE INDEX IF NOT EXISTS idx_fact_item ON fact_prices(item_id);
+-- Prices arrive in date order, so a BRIN index stays tiny and still lets
+-- date-range scans skip most blocks
+CREATE INDEX IF NOT EXISTS idx_fact_price_date ON fact_prices USING BRIN (price_date);
+
+-- SUMMARY tables
+-- Maintained by load_db.py: each load recomputes only the item/week and
+-- item/year groups it touched, from observed (non-forecast) prices.
+-- `python etl/load_db.py --rebuild-summaries` recomputes them all.
+CREATE TABLE IF NOT EXISTS item_latest_price (
+    item_id INT PRIMARY KEY REFERENCES dim_item(item_id),
+    price_date DATE NOT NULL,
+    price NUMERIC(10,2) NOT NULL
 );
 
-CREATE INDEX idx_fact_item ON fact_prices(item_id);
-CREATE INDEX idx_fact_date ON fact_prices(date_id);
+CREATE TABLE IF NOT EXISTS item_weekly_prices (
+    item_id INT NOT NULL REFERENCES dim_item(item_id),
+    week_start DATE NOT NULL,
+    min_price NUMERIC(10,2) NOT NULL,
+    avg_price NUMERIC(10,2) NOT NULL,
+    max_price NUMERIC(10,2) NOT NULL,
+    n_prices INT NOT NULL,
+    PRIMARY KEY (item_id, week_start)
+);
+
+-- Sum and count are kept so averages over several years stay exact
+CREATE TABLE IF NOT EXISTS item_december_prices (
+    item_id INT NOT NULL REFERENCES dim_item(item_id),
+    year INT NOT NULL,
+    avg_price NUMERIC(12,4) NOT NULL,
+    total_price NUMERIC(14,2) NOT NULL,
+    n_prices INT NOT NULL,
+    PRIMARY KEY (item_id, year)
+);
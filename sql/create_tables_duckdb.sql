@@ -0,0 +1,64 @@
+-- Embedded DuckDB copy of the star schema in create_tables.sql, used when
+-- NOCHE_DB_BACKEND=duckdb. etl/db.py runs this on every connect, so it must
+-- stay idempotent. DuckDB has no SERIAL, partitions or BRIN (its storage is
+-- columnar with per-block min/max already), and foreign keys are left out
+-- because DuckDB rejects ON CONFLICT updates on referenced rows.
+
+-- ITEM dimension
+CREATE SEQUENCE IF NOT EXISTS dim_item_id_seq;
+CREATE TABLE IF NOT EXISTS dim_item (
+    item_id INTEGER PRIMARY KEY DEFAULT nextval('dim_item_id_seq'),
+    item_name TEXT UNIQUE NOT NULL,
+    category TEXT,
+    specification TEXT
+);
+
+-- DATE dimension
+CREATE SEQUENCE IF NOT EXISTS dim_date_id_seq;
+CREATE TABLE IF NOT EXISTS dim_date (
+    date_id INTEGER PRIMARY KEY DEFAULT nextval('dim_date_id_seq'),
+    date DATE UNIQUE NOT NULL,
+    week_num INTEGER
+);
+
+-- PRICE fact table
+CREATE SEQUENCE IF NOT EXISTS fact_prices_id_seq;
+CREATE TABLE IF NOT EXISTS fact_prices (
+    price_id BIGINT PRIMARY KEY DEFAULT nextval('fact_prices_id_seq'),
+    item_id INTEGER NOT NULL,
+    date_id INTEGER NOT NULL,
+    price_date DATE NOT NULL,
+    price DECIMAL(10,2) NOT NULL CHECK (price >= 0),
+    is_forecast BOOLEAN NOT NULL DEFAULT false,
+    UNIQUE (item_id, price_date)
+);
+
+-- SUMMARY views
+-- Same columns as the summary tables in Postgres; DuckDB aggregates the
+-- fact table fast enough that they are computed on read.
+CREATE OR REPLACE VIEW item_latest_price AS
+SELECT DISTINCT ON (item_id) item_id, price_date, price
+FROM fact_prices
+WHERE NOT is_forecast
+ORDER BY item_id, price_date DESC;
+
+CREATE OR REPLACE VIEW item_weekly_prices AS
+SELECT item_id,
+       date_trunc('week', price_date)::date AS week_start,
+       min(price) AS min_price,
+       round(avg(price), 2) AS avg_price,
+       max(price) AS max_price,
+       count(*) AS n_prices
+FROM fact_prices
+WHERE NOT is_forecast
+GROUP BY item_id, week_start;
+
+CREATE OR REPLACE VIEW item_december_prices AS
+SELECT item_id,
+       EXTRACT(YEAR FROM price_date)::int AS year,
+       avg(price) AS avg_price,
+       sum(price) AS total_price,
+       count(*) AS n_prices
+FROM fact_prices
+WHERE NOT is_forecast AND EXTRACT(MONTH FROM price_date) = 12
+GROUP BY item_id, year;
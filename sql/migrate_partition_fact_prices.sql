@@ -0,0 +1,62 @@
+-- One-off migration from the single-table fact_prices to the partitioned
+-- layout in create_tables.sql. Run once, inside psql:
+--   cat sql/migrate_partition_fact_prices.sql | docker exec -i nochebuena-budget-tracker_postgres psql -U noche_user -d nochebuena
+
+BEGIN;
+
+ALTER TABLE fact_prices RENAME TO fact_prices_old;
+ALTER INDEX IF EXISTS idx_fact_item RENAME TO idx_fact_item_old;
+ALTER INDEX IF EXISTS idx_fact_date RENAME TO idx_fact_date_old;
+
+CREATE TABLE fact_prices (
+    price_id BIGSERIAL,
+    item_id INT NOT NULL REFERENCES dim_item(item_id),
+    date_id INT NOT NULL REFERENCES dim_date(date_id),
+    price_date DATE NOT NULL,
+    price NUMERIC(10,2) NOT NULL CHECK (price >= 0),
+    is_forecast BOOLEAN NOT NULL DEFAULT false,
+    PRIMARY KEY (price_id, price_date),
+    UNIQUE (item_id, price_date)
+) PARTITION BY RANGE (price_date);
+
+-- One partition per year present in the old table
+DO $$
+DECLARE y INT;
+BEGIN
+    FOR y IN
+        SELECT DISTINCT EXTRACT(YEAR FROM d.date)::INT
+        FROM fact_prices_old f JOIN dim_date d ON d.date_id = f.date_id
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE fact_prices_%s PARTITION OF fact_prices FOR VALUES FROM (%L) TO (%L)',
+            y, make_date(y, 1, 1), make_date(y + 1, 1, 1)
+        );
+    END LOOP;
+END $$;
+
+-- Keep the forecast flag if the old table has it; otherwise the only
+-- forecasts are the trainer's Christmas Eve predictions
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'fact_prices_old' AND column_name = 'is_forecast'
+    ) THEN
+        INSERT INTO fact_prices (item_id, date_id, price_date, price, is_forecast)
+        SELECT f.item_id, f.date_id, d.date, f.price, f.is_forecast
+        FROM fact_prices_old f
+        JOIN dim_date d ON d.date_id = f.date_id;
+    ELSE
+        INSERT INTO fact_prices (item_id, date_id, price_date, price, is_forecast)
+        SELECT f.item_id, f.date_id, d.date, f.price, d.date = DATE '2025-12-24'
+        FROM fact_prices_old f
+        JOIN dim_date d ON d.date_id = f.date_id;
+    END IF;
+END $$;
+
+CREATE INDEX idx_fact_item ON fact_prices(item_id);
+CREATE INDEX idx_fact_price_date ON fact_prices USING BRIN (price_date);
+
+DROP TABLE fact_prices_old;
+
+COMMIT;
@@ -0,0 +1,11 @@
+import os
+import sys
+from pathlib import Path
+
+# Add project root to sys.path so 'etl' and 'ml' can be imported
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT_DIR))
+
+# Database tests run against a throwaway in-memory DuckDB, never a real server
+os.environ["NOCHE_DB_BACKEND"] = "duckdb"
+os.environ["NOCHE_DUCKDB_FILE"] = ":memory:"
@@ -0,0 +1,28 @@
+import pandas as pd
+
+from etl.dates import DateResolver
+
+def resolve(resolver, days):
+    return [str(d.date()) for d in resolver.resolve(pd.Series(days))]
+
+def test_year_rolls_over_into_january():
+    assert resolve(DateResolver(2025), ["December 30", "January 2"]) == ["2025-12-30", "2026-01-02"]
+
+def test_second_december_sheet_stays_in_its_season():
+    days = ["December 28", "January 2", "December 30", "January 2", "December 11"]
+    assert resolve(DateResolver(2025), days) == [
+        "2025-12-28", "2026-01-02", "2025-12-30", "2026-01-02", "2025-12-11",
+    ]
+
+def test_december_backfill_after_january_watermark():
+    resolver = DateResolver.after("2026-01-02")
+    assert resolve(resolver, ["December 11", "January 5"]) == ["2025-12-11", "2026-01-05"]
+
+def test_explicit_year_restarts_counting():
+    days = ["December 4", "January 3", "January 5, 2027", "December 1"]
+    assert resolve(DateResolver(2025), days) == ["2025-12-04", "2026-01-03", "2027-01-05", "2026-12-01"]
+
+def test_state_carries_over_between_chunks():
+    resolver = DateResolver(2025)
+    assert resolve(resolver, ["December 30"]) == ["2025-12-30"]
+    assert resolve(resolver, ["January 2"]) == ["2026-01-02"]
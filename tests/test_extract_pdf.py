@@ -0,0 +1,69 @@
+import csv
+
+import pytest
+from reportlab.lib.pagesizes import LETTER
+from reportlab.pdfgen import canvas
+
+from etl import extract_pdf
+
+PAGES = [
+    ["BANTAY PRESYO", "December 11, 2025", "FRUITS",
+     ("Banana (Lakatan)", "Medium", "90.00"), ("Calamansi", "n/a", "110.50")],
+    ["PORK MEAT PRODUCTS", ("Pork Belly", "Liempo", "380.00"), ("Pork Ham", "Kasim", "340.00")],
+]
+
+def write_pdf(path, pages):
+    """Bantay Presyo-like sheet: one line per table row, cells in separate columns"""
+    pdf = canvas.Canvas(str(path), pagesize=LETTER)
+    for lines in pages:
+        y = 720
+        for line in lines:
+            if isinstance(line, tuple):
+                for x, cell in zip([60, 260, 480], line):
+                    pdf.drawString(x, y, cell)
+            else:
+                pdf.drawString(60, y, line)
+            y -= 24
+        pdf.showPage()
+    pdf.save()
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    monkeypatch.setattr(extract_pdf, "RAW_DIR", raw)
+    monkeypatch.setattr(extract_pdf, "OUTPUT_FILE", tmp_path / "extracted_prices.csv")
+    monkeypatch.setattr(extract_pdf, "MANIFEST_FILE", tmp_path / "extract_manifest.json")
+    return raw
+
+def read_rows():
+    with open(extract_pdf.OUTPUT_FILE, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+def test_extracts_rows_across_pages(workspace):
+    write_pdf(workspace / "prices.pdf", PAGES)
+    assert extract_pdf.extract(workers=1) == 4
+    assert read_rows() == [
+        extract_pdf.OUTPUT_COLUMNS,
+        ["December 11, 2025", "FRUITS", "Banana (Lakatan)", "Medium", "90.00"],
+        ["December 11, 2025", "FRUITS", "Calamansi", "n/a", "110.50"],
+        ["December 11, 2025", "PORK MEAT PRODUCTS", "Pork Belly", "Liempo", "380.00"],
+        ["December 11, 2025", "PORK MEAT PRODUCTS", "Pork Ham", "Kasim", "340.00"],
+    ]
+
+def test_rerun_skips_extracted_pdfs(workspace):
+    write_pdf(workspace / "prices.pdf", PAGES)
+    extract_pdf.extract(workers=1)
+    assert extract_pdf.extract(workers=1) == 0
+    assert len(read_rows()) == 5
+
+def test_rebuild_reextracts(workspace):
+    write_pdf(workspace / "prices.pdf", PAGES)
+    extract_pdf.extract(workers=1)
+    assert extract_pdf.extract(workers=1, rebuild=True) == 4
+    assert len(read_rows()) == 5
+
+def test_rebuild_without_pdfs_keeps_output(workspace):
+    extract_pdf.OUTPUT_FILE.write_text("day,category,item_name,specification,price\n")
+    assert extract_pdf.extract(workers=1, rebuild=True) == 0
+    assert extract_pdf.OUTPUT_FILE.exists()
@@ -0,0 +1,160 @@
+import json
+
+import pandas as pd
+import pytest
+
+from etl import db, load_db
+
+def frame(rows):
+    """Cleaned-price frame typed like read_dataset("cleaned_prices")"""
+    df = pd.DataFrame(rows, columns=["date", "category", "item_name", "specification", "price"])
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+PRICES = frame([
+    ("2025-12-04", "FRUITS", "Calamansi", "", 110.0),
+    ("2025-12-04", "FRUITS", "Papaya", "Solo, Ripe", 70.0),
+    ("2025-12-04", "PORK MEAT PRODUCTS", "Pork Belly", "Liempo", 380.0),
+    ("2025-12-11", "FRUITS", "Calamansi", "", 112.5),
+    ("2025-12-11", "FRUITS", "Papaya", "Solo, Ripe", 72.0),
+    ("2025-12-11", "PORK MEAT PRODUCTS", "Pork Belly", "Liempo", 385.0),
+])
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Fresh in-memory DuckDB with the star schema; manifest and key cache under tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    db._duckdb = None
+    yield
+    db._duckdb.close()
+    db._duckdb = None
+
+def query(sql_text, params=()):
+    with db.transaction() as conn, conn.cursor() as cur:
+        cur.execute(sql_text, params)
+        return cur.fetchall()
+
+def stored_prices():
+    rows = query("""
+        SELECT i.item_name, f.price_date, f.price
+        FROM fact_prices f JOIN dim_item i ON i.item_id = f.item_id
+        ORDER BY 1, 2
+    """)
+    return [(name, str(day), float(price)) for name, day, price in rows]
+
+# Staging
+def test_staging_frames_validate_and_dedupe():
+    df = load_db.prepare(pd.concat([PRICES, frame([
+        ("2025-12-04", "FRUITS", "Calamansi", "", 999.0),      # repeated (item, date)
+        ("2025-12-04", "FRUITS", "Mango", "", -1.0),           # negative price
+        ("2025-12-04", "FRUITS", "Papaya", "Large", 90.0),     # second spec
+    ])], ignore_index=True))
+    items, dates, prices = load_db.staging_frames(df)
+
+    assert items.set_index("item_name").loc["Papaya", "specification"] == "Solo, Ripe, Large"
+    assert sorted(dates["week_num"]) == [49, 50]
+    calamansi = prices[(prices["item_name"] == "Calamansi") & (prices["date"] == "2025-12-04")]
+    assert calamansi["price"].tolist() == [110.0]  # first row wins
+    assert "Mango" not in set(prices["item_name"])
+
+# Loads
+def test_first_load_inserts_everything(database):
+    stats = load_db.load(PRICES)
+    assert (stats["inserted"], stats["updated"], stats["skipped"]) == (6, 0, 0)
+    assert stats["items"] == 3 and stats["dates"] == 2 and stats["prices"] == 6
+    assert stored_prices() == [
+        ("Calamansi", "2025-12-04", 110.0), ("Calamansi", "2025-12-11", 112.5),
+        ("Papaya", "2025-12-04", 70.0), ("Papaya", "2025-12-11", 72.0),
+        ("Pork Belly", "2025-12-04", 380.0), ("Pork Belly", "2025-12-11", 385.0),
+    ]
+    assert query("SELECT category, specification FROM dim_item WHERE item_name = 'Papaya'") == [
+        ("FRUITS", "Solo, Ripe"),
+    ]
+
+def test_repeat_load_writes_nothing(database):
+    load_db.load(PRICES)
+    stats = load_db.load(PRICES)
+    assert (stats["inserted"], stats["updated"], stats["skipped"]) == (0, 0, 6)
+    assert stats["items"] == stats["dates"] == stats["prices"] == 0
+    assert stats["cached"] == {"items": 3, "dates": 2}
+
+def test_changed_price_is_updated(database):
+    load_db.load(PRICES)
+    changed = PRICES.copy()
+    changed.loc[changed["item_name"] == "Papaya", "price"] += 5
+    stats = load_db.load(changed)
+    assert (stats["inserted"], stats["updated"], stats["skipped"]) == (0, 2, 4)
+    assert [p for p in stored_prices() if p[0] == "Papaya"] == [
+        ("Papaya", "2025-12-04", 75.0), ("Papaya", "2025-12-11", 77.0),
+    ]
+
+def test_resolve_keys_maps_to_surrogate_ids(database):
+    load_db.load(PRICES)
+    ids = dict(query("SELECT item_name, item_id FROM dim_item"))
+    with db.transaction() as conn, conn.cursor() as cur:
+        keys = load_db.resolve_keys(cur, frame([
+            ("2025-12-11", "FRUITS", "Calamansi", "", 112.5),
+            ("2025-12-18", "FRUITS", "Calamansi", "", 115.0),   # date not in dim_date
+            ("2025-12-11", "FRUITS", "Durian", "", 200.0),      # item not in dim_item
+        ]))
+    assert [(k[0], str(k[2]), k[3]) for k in keys] == [(ids["Calamansi"], "2025-12-11", 112.5)]
+
+def test_summaries_follow_the_facts(database):
+    load_db.load(PRICES)
+    latest = query("""
+        SELECT i.item_name, l.price FROM item_latest_price l
+        JOIN dim_item i ON i.item_id = l.item_id ORDER BY 1
+    """)
+    assert [(name, float(price)) for name, price in latest] == [
+        ("Calamansi", 112.5), ("Papaya", 72.0), ("Pork Belly", 385.0),
+    ]
+
+# Change detection: both load methods report the same counts
+METHODS = ["copy", "insert"]
+
+def manifest():
+    return json.loads(load_db.MANIFEST_FILE.read_text())["loads"]
+
+def counts(stats):
+    return stats["inserted"], stats["updated"], stats["skipped"]
+
+@pytest.mark.parametrize("method", METHODS)
+def test_counts_new_changed_and_unchanged_rows(database, method):
+    assert counts(load_db.load(PRICES.iloc[:4], method)) == (4, 0, 0)
+    changed = PRICES.copy()
+    changed.loc[changed["item_name"] == "Calamansi", "price"] += 1
+    # 2 new rows, Calamansi changed on both dates, the other 2 unchanged
+    assert counts(load_db.load(changed, method)) == (2, 2, 2)
+    assert counts(load_db.load(changed, method)) == (0, 0, 6)
+
+    loads = manifest()
+    assert [counts(entry) for entry in loads] == [(4, 0, 0), (2, 2, 2), (0, 0, 6)]
+    assert {entry["mode"] for entry in loads} == ({"delta"} if method == "copy" else {"insert"})
+
+@pytest.mark.parametrize("method", METHODS)
+def test_observed_price_replaces_forecast(database, method):
+    load_db.load(PRICES, method)
+    query("INSERT INTO dim_date (date, week_num) VALUES ('2025-12-24', 52)")
+    query("""
+        INSERT INTO fact_prices (item_id, date_id, price_date, price, is_forecast)
+        SELECT i.item_id, d.date_id, d.date, 125.0, true
+        FROM dim_item i, dim_date d
+        WHERE i.item_name = 'Calamansi' AND d.date = '2025-12-24'
+    """)
+    observed = pd.concat([PRICES, frame([("2025-12-24", "FRUITS", "Calamansi", "", 118.0)])])
+
+    # A forecast is not an observed price, so the observation counts as new
+    assert counts(load_db.load(observed, method)) == (1, 0, 6)
+    assert query("""
+        SELECT price, is_forecast FROM fact_prices WHERE price_date = '2025-12-24'
+    """) == [(pytest.approx(118.0), False)]
+
+@pytest.mark.parametrize("method", METHODS)
+def test_full_load_stages_everything_but_changes_nothing(database, method):
+    load_db.load(PRICES, method)
+    before = stored_prices()
+    stats = load_db.load(PRICES, method, delta=False)
+    assert stats["skipped"] == 6
+    assert stats["mode"] == ("full" if method == "copy" else "insert")
+    assert stored_prices() == before
+    assert len(manifest()) == 2
@@ -0,0 +1,49 @@
+import json
+
+import pandas as pd
+import pytest
+
+from etl.clean_prices import VOCABULARY_FILE, build_index, clean_items, clean_specs
+from etl.cleaning_metrics import CleaningMetrics
+from etl.ocr_index import MIN_CONFIDENCE
+
+def clean_spec(spec):
+    _, cleaned, rule = clean_specs(pd.Series([spec]), ["Tomato"], CleaningMetrics())
+    return cleaned[0], rule[0]
+
+def test_map_entries_resolve_to_their_canonical_name():
+    index = build_index({"Bel1 Pepper (Red)": "Bell Pepper (Red)"})
+    canonical, score = index.lookup("Bel1 Pepper (Red);")
+    assert canonical == "Bell Pepper (Red)"
+    assert score >= MIN_CONFIDENCE
+
+def test_known_names_without_map_entry_resolve():
+    index = build_index({}, ["Banana (Lakatan)", "Beef Brisket, Local"])
+    assert index.lookup("Banana (Lakatan)~")[0] == "Banana (Lakatan)"
+    assert index.lookup("Beef Brisket, Loca1")[0] == "Beef Brisket, Local"
+
+def test_unrelated_text_is_not_resolved():
+    index = build_index({}, ["Banana (Lakatan)"])
+    canonical, score = index.lookup("Galunggong, Imported")
+    assert canonical is None or score < MIN_CONFIDENCE
+
+@pytest.mark.parametrize("spec", [
+    "19–21 pcs/kg",
+    "16–18 pcs/kg",
+    "Medium (451–600 g/bunch)",
+])
+def test_unseen_size_grades_are_kept(spec):
+    assert clean_spec(spec) == (spec, None)
+
+def test_numbers_must_match_to_resolve():
+    index = build_index({}, ["10–12 pcs/kg", "15–18 pcs/kg"])
+    assert index.lookup("19–21 pcs/kg")[0] is None
+    assert index.lookup("15–18 pcs/kg;")[0] == "15–18 pcs/kg"
+
+def test_vocabulary_names_clean_to_themselves():
+    vocabulary = json.loads(VOCABULARY_FILE.read_text(encoding="utf-8"))
+    names = pd.Series(vocabulary["item_name"])
+    assert list(clean_items(names, CleaningMetrics())[1]) == list(names)
+    specs = pd.Series(vocabulary["specification"])
+    _, cleaned, _ = clean_specs(specs, ["Tomato"] * len(specs), CleaningMetrics())
+    assert list(cleaned) == list(specs)
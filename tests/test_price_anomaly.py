@@ -0,0 +1,82 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from etl.price_anomaly import PriceDetector
+
+CLEANED_FILE = Path(__file__).resolve().parents[1] / "data" / "processed" / "cleaned_prices.csv"
+
+FRUITS = {
+    "Banana (Lakatan)": 90,
+    "Banana (Latundan)": 75,
+    "Calamansi": 110,
+    "Papaya": 70,
+    "Pineapple": 95,
+    "Watermelon": 80,
+}
+
+def fruit_detector():
+    detector = PriceDetector()
+    for item, price in FRUITS.items():
+        assert detector.check(price, item, None, "FRUITS") == (price, None)
+    return detector
+
+def test_known_item_decimal_slip_is_scaled():
+    detector = fruit_detector()
+    price, rule = detector.check(9000, "Calamansi", None, "FRUITS")
+    assert rule == "price_div100"
+    assert price == 90
+
+def test_new_item_x10_slip_is_scaled_by_ceiling():
+    detector = fruit_detector()
+    price, rule = detector.check(1500, "Mango", None, "FRUITS")
+    assert rule == "price_div10"
+    assert price == 150
+    # The corrected price seeds the item, so the next surveys are accepted
+    assert detector.check(150, "Mango", None, "FRUITS") == (150, None)
+    assert detector.check(155, "Mango", None, "FRUITS") == (155, None)
+
+def test_first_seen_item_is_not_rescaled_by_category():
+    detector = PriceDetector()
+    assert detector.check(21.05, "Salt", "Iodized", "OTHER BASIC COMMODITIES") == (21.05, None)
+    oil = ("Cooking Oil (Coconut)", "1 L", "OTHER BASIC COMMODITIES")
+    for price in [162.24, 161.0, 163.0]:
+        assert detector.check(price, *oil) == (price, None)
+
+def test_cheap_item_first_does_not_skew_category():
+    detector = PriceDetector()
+    assert detector.check(8.25, "Chicken Egg", "Medium", "POULTRY PRODUCTS") == (8.25, None)
+    for item, price in [("Whole Chicken", 210.0), ("Chicken Breast", 228.0), ("Chicken Leg", 218.0)]:
+        assert detector.check(price, item, None, "POULTRY PRODUCTS") == (price, None)
+
+@pytest.mark.parametrize("columns, ascending", [
+    (["date", "category", "price"], True),
+    (["date", "category", "price"], False),
+    (["price"], True),
+    (["price"], False),
+])
+def test_cleaned_prices_are_never_rescaled_in_any_order(columns, ascending):
+    df = pd.read_csv(CLEANED_FILE).sort_values(columns, ascending=ascending)
+    detector = PriceDetector()
+    rules = {
+        detector.check(row.price, row.item_name, row.specification, row.category)[1]
+        for row in df.itertuples()
+    }
+    assert rules <= {None, "price_outlier"}
+
+def test_new_expensive_item_is_kept():
+    detector = fruit_detector()
+    assert detector.check(400, "Grapes", None, "FRUITS") == (400, None)
+
+def test_cold_start_uses_legacy_ceilings():
+    detector = PriceDetector()
+    assert detector.check(1500, "Mango", None, "FRUITS") == (150, "price_div10")
+    assert detector.check(25000, "Pork Belly", None, "PORK") == (250, "price_div100")
+
+def test_state_round_trip(tmp_path):
+    detector = fruit_detector()
+    detector.save(tmp_path / "stats.json")
+    loaded = PriceDetector.load(tmp_path / "stats.json")
+    assert loaded.items == detector.items
+    assert loaded.categories == detector.categories